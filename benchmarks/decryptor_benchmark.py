@@ -0,0 +1,175 @@
+"""
+Benchmark for the decryptor. Decrypts every message example, and synthetic ciphertexts of growing length, under each
+examine order and records the wall time, tuples examined, peak memory and accuracy of each decryption as JSON.
+
+The message examples are scored against the keys in message_examples/message_example_keys.json. The synthetic
+ciphertexts are sentences of random dictionary words encrypted with random keys, so their scaling can be compared from
+run to run.
+
+Usage (from the repository root): python -m benchmarks.decryptor_benchmark --output benchmark.json
+"""
+import argparse
+import collections
+import datetime
+import glob
+import json
+import logging
+import os
+import platform
+import random
+import string
+import sys
+import time
+import tracemalloc
+
+from decryptor.batch import read_encrypted_message
+from decryptor.decryptor import SscDecryptor
+from decryptor.examineorder import ExamineOrder
+from decryptor.indexbuilder import build_word_index, load_plaintext_words
+from decryptor.joinengine import JoinEngine
+from decryptor.searchmode import SearchMode
+
+
+def main(args):
+    word_index = build_word_index(args.words_files, args.index_file, frequency_file=args.frequency_file)
+    decryptor = SscDecryptor(logging.WARN, word_index)
+    examine_orders = [ExamineOrder[order] for order in args.orders]
+    join_engine = JoinEngine[args.join_engine]
+    search_mode = SearchMode[args.search]
+
+    with open(args.keys_file, 'r', encoding='utf-8') as keys_file:
+        message_keys = json.load(keys_file)
+
+    results = {
+        'metadata': {
+            'started': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'words_files': args.words_files,
+            'join_engine': join_engine.name,
+            'search_mode': search_mode.name,
+            'frequency_file': args.frequency_file,
+            'seed': args.seed,
+        },
+        'examples': list(),
+        'synthetic': list(),
+    }
+
+    for message_file in sorted(glob.glob(os.path.join(args.examples_dir, '*.txt'))):
+        message_name = os.path.basename(message_file)
+        if message_name not in message_keys:
+            _progress(f"Skipping {message_name}: no key")
+            continue
+
+        with open(message_file, 'r', encoding='utf-8') as message:
+            encrypted_message = read_encrypted_message(message)
+
+        for examine_order in examine_orders:
+            result = {'message': message_name, 'order': examine_order.name}
+            result.update(benchmark_decryption(decryptor, encrypted_message, message_keys[message_name], examine_order, join_engine, search_mode))
+            results['examples'].append(result)
+            _progress(result)
+
+    words = [word for word in load_plaintext_words(args.words_files[0]) if word.isascii() and word.isalpha()]
+    rng = random.Random(args.seed)
+    for sentence_length in args.synthetic_lengths:
+        for sample in range(args.synthetic_samples):
+            plaintext, key = random_ciphertext_key(words, sentence_length, rng)
+            encrypted_message = plaintext.translate(str.maketrans(''.join(key.values()), ''.join(key.keys())))
+
+            for examine_order in examine_orders:
+                result = {'words': sentence_length, 'sample': sample, 'order': examine_order.name}
+                result.update(benchmark_decryption(decryptor, encrypted_message, key, examine_order, join_engine, search_mode))
+                results['synthetic'].append(result)
+                _progress(result)
+
+    output = open(args.output, 'w', encoding='utf-8') if args.output is not None else sys.stdout
+    try:
+        json.dump(results, output, indent=2)
+        output.write("\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+def benchmark_decryption(decryptor: SscDecryptor, encrypted_message: str, key: dict, examine_order: ExamineOrder, join_engine: JoinEngine,
+                         search_mode: SearchMode = SearchMode.EXHAUSTIVE) -> dict:
+    """
+    Decrypts the message twice: once timed, and once traced for its peak memory, since tracing slows the decryption
+    down. The key maps encrypted letters to plaintext letters.
+    """
+    begin_decrypt = time.perf_counter()
+    alphabets_map = decryptor.deduce_ciphertext_alphabet(encrypted_message, examine_order, join_engine, search_mode=search_mode)
+    end_decrypt = time.perf_counter()
+    tuples_examined = decryptor.last_stats.total_tuples_compared
+    most_likely_key = decryptor.last_stats.most_likely_key
+
+    tracemalloc.start()
+    try:
+        decryptor.deduce_ciphertext_alphabet(encrypted_message, examine_order, join_engine, search_mode=search_mode)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    result = {
+        'seconds': round(end_decrypt - begin_decrypt, 6),
+        'tuples_examined': tuples_examined,
+        'most_likely_key': most_likely_key,
+        'peak_memory_bytes': peak_memory,
+    }
+    result.update(score_alphabets_map(encrypted_message, alphabets_map, key))
+
+    return result
+
+
+def score_alphabets_map(encrypted_message: str, alphabets_map: dict, key: dict) -> dict:
+    """
+    Returns the accuracy of an alphabets map against the key: the fraction of the key's encrypted letters that were
+    resolved to the right plaintext letter, and the fraction of the message's letters that decrypt correctly.
+    """
+    correct_letters = {encrypted_letter for encrypted_letter, plaintext_letter in key.items() if alphabets_map.get(encrypted_letter) == [plaintext_letter]}
+    message_letters = collections.Counter(symbol for symbol in encrypted_message.upper() if symbol in key)
+    total_message_letters = sum(message_letters.values())
+
+    return {
+        'letters': len(key),
+        'correct_letters': len(correct_letters),
+        'key_accuracy': round(len(correct_letters) / len(key), 6) if len(key) > 0 else None,
+        'text_accuracy': round(sum(message_letters[letter] for letter in correct_letters) / total_message_letters, 6) if total_message_letters > 0 else None,
+    }
+
+
+def random_ciphertext_key(words: list, sentence_length: int, rng: random.Random) -> tuple:
+    """
+    Returns a plaintext sentence of random words and a random key, as a dict of the encrypted letters (keys) and
+    plaintext letters (values) used by the sentence.
+    """
+    plaintext = ' '.join(rng.choice(words) for _ in range(sentence_length))
+    encrypted_alphabet = list(string.ascii_uppercase)
+    rng.shuffle(encrypted_alphabet)
+
+    key = {encrypted_letter: plaintext_letter for encrypted_letter, plaintext_letter in zip(encrypted_alphabet, string.ascii_uppercase) if plaintext_letter in plaintext}
+    return plaintext, dict(sorted(key.items()))
+
+
+def _progress(message) -> None:
+    print(message, file=sys.stderr, flush=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-w', '--words-files', nargs='*', default=['words/dictionary.txt'],
+                        help="Dictionary (words) files. Synthetic sentences are drawn from the first one")
+    parser.add_argument('--index-file', default='decryptor/wordindex.idx', help="Word index file")
+    parser.add_argument('--examples-dir', default='message_examples', help="Directory of message examples")
+    parser.add_argument('--keys-file', default='message_examples/message_example_keys.json', help="Keys of the message examples")
+    parser.add_argument('-o', '--orders', nargs='*', default=[e.name for e in ExamineOrder], choices=[e.name for e in ExamineOrder], help="Examine orders to benchmark")
+    parser.add_argument('-e', '--join-engine', default='VECTORIZED', choices=[e.name for e in JoinEngine], help="Join engine to benchmark")
+    parser.add_argument('--search', default='EXHAUSTIVE', choices=[e.name for e in SearchMode], help="Search mode to benchmark")
+    parser.add_argument('--frequency-file', default=None, help="Word frequencies file used to weight the dictionary words")
+    parser.add_argument('--synthetic-lengths', type=int, nargs='*', default=[5, 10, 20, 40, 80, 160, 320], help="Number of words in each synthetic sentence")
+    parser.add_argument('--synthetic-samples', type=int, default=3, help="Number of synthetic sentences per length")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for the synthetic sentences and keys")
+    parser.add_argument('--output', default=None, help="JSON output file (default: stdout)")
+
+    main(parser.parse_args())
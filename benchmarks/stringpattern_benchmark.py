@@ -0,0 +1,73 @@
+"""
+Microbenchmark for StringPattern. Compares the original numpy.base_repr implementation with the code based patterns and
+the pattern cache, over dictionary words and over combined tuple strings.
+
+Usage (from the repository root): python -m benchmarks.stringpattern_benchmark -w words/dictionary.txt
+"""
+import argparse
+import codecs
+import random
+import string
+import timeit
+
+import numpy as np
+
+from decryptor.stringpattern import StringPattern
+
+
+def legacy_string_to_pattern(string):
+    """The original StringPattern implementation, kept for comparison."""
+    pattern = str()
+    unique_chars_base_repr = dict()
+
+    for char in string:
+        if char not in unique_chars_base_repr:
+            unique_chars_base_repr[char] = np.base_repr(len(unique_chars_base_repr) + 1, base=26)
+        pattern += unique_chars_base_repr[char]
+    return str(len(string)) + '-' + pattern
+
+
+def main(args):
+    with codecs.open(args.words_file, 'r', encoding='utf-8', errors="ignore") as words:
+        words = [word.rstrip().translate(str.maketrans('', '', string.punctuation)).upper() for word in words]
+
+    random.seed(args.seed)
+    sample_words = random.sample(words, min(args.sample_size, len(words)))
+    tuple_strings = [''.join(random.sample(sample_words, 3)) for _ in range(len(sample_words))]
+
+    # Check that the implementations agree before timing them.
+    for sample in sample_words + tuple_strings:
+        assert legacy_string_to_pattern(sample) == StringPattern(sample).get_pattern()
+
+    StringPattern.cached.cache_clear()
+    for word in sample_words:
+        StringPattern.cached(word)
+
+    benchmarks = [
+        ("words: legacy base_repr pattern", lambda: [legacy_string_to_pattern(word) for word in sample_words]),
+        ("words: StringPattern.get_pattern", lambda: [StringPattern(word).get_pattern() for word in sample_words]),
+        ("words: StringPattern.string_to_code", lambda: [StringPattern.string_to_code(word) for word in sample_words]),
+        ("words: StringPattern.cached (warm)", lambda: [StringPattern.cached(word).get_pattern() for word in sample_words]),
+        ("tuples: legacy base_repr pattern", lambda: [legacy_string_to_pattern(joined) for joined in tuple_strings]),
+        ("tuples: StringPattern.string_to_code", lambda: [StringPattern.string_to_code(joined) for joined in tuple_strings]),
+    ]
+
+    print(f"{len(sample_words)} strings per run, best of {args.repeat} runs\n")
+    baseline = None
+    for name, benchmark in benchmarks:
+        seconds = min(timeit.repeat(benchmark, number=1, repeat=args.repeat))
+        if name.endswith("legacy base_repr pattern"):
+            baseline = seconds
+
+        per_string = seconds / len(sample_words) * 1e6
+        print(f"{name.ljust(40)} {per_string:8.3f} us/string {baseline / seconds:8.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-w', '--words-file', default='words/dictionary.txt', help="Dictionary (words) file to sample")
+    parser.add_argument('-n', '--sample-size', type=int, default=20000, help="Number of words to sample")
+    parser.add_argument('-r', '--repeat', type=int, default=5, help="Number of timed runs per benchmark")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for the word sample")
+
+    main(parser.parse_args())
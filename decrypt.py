@@ -1,31 +1,38 @@
 import argparse
-import codecs
-import importlib
 import itertools
+import json
 import logging
-import os
-import pprint
 import string
 import sys
 import time
-import types
-from collections import OrderedDict
-from pathlib import Path
 
 import tableformatter
 
+from decryptor.batch import decrypt_messages, read_encrypted_message, read_messages
+from decryptor.budget import DeductionBudget
+from decryptor.decryptor import SscDecryptor
 from decryptor.examineorder import ExamineOrder
-from decryptor.stringpattern import StringPattern
+from decryptor.indexbuilder import build_word_index
+from decryptor.joinengine import JoinEngine
+from decryptor.keycache import KeyCache
+from decryptor.searchmode import SearchMode
+from decryptor.server import DecryptionServer
 
 logging.basicConfig(format="%(message)s", stream=sys.stdout, level=logging.INFO)
 logger = logging.getLogger()
 
+# The decryptor package may have configured logging first, so set the level explicitly.
+logger.setLevel(logging.INFO)
+
+WORD_INDEX_FILE = "decryptor/wordindex.idx"
+
 def main(args):
     verbose_info = args.verbose_info
     verbose_debug = args.verbose_debug
     words_files = args.words_files
     examine_word_order = ExamineOrder[args.order]
-    suppress_encrypted_text_output = args.suppress_encrypted_text_output
+    join_engine = JoinEngine[args.join_engine]
+    budget = _get_budget(args)
 
     decryptor_log_level = logging.WARN
     if verbose_info:
@@ -33,11 +40,33 @@ def main(args):
     if verbose_debug:
         decryptor_log_level = logging.DEBUG
 
-    # Create wordpatterns module from the given words files.
-    _build_word_patterns_module(words_files, "decryptor/wordpatterns.py")
+    # Create the word index from the given words files.
+    word_index = build_word_index(words_files, WORD_INDEX_FILE, args.index_workers, args.frequency_file)
+
+    if args.batch is not None:
+        _decrypt_batch(args, decryptor_log_level, examine_word_order, join_engine, budget)
+        return
+
+    if args.serve is not None:
+        _serve(args, decryptor_log_level, examine_word_order, join_engine, budget)
+        return
+
+    key_cache = KeyCache(args.key_cache) if args.key_cache is not None else None
+    decryptor = SscDecryptor(decryptor_log_level, word_index, args.join_workers, key_cache)
+    try:
+        if args.stream is not None:
+            _decrypt_stream(args, decryptor, examine_word_order, join_engine, budget)
+        elif args.group is not None:
+            _decrypt_group(args, decryptor, examine_word_order, join_engine, budget)
+        else:
+            _decrypt_message(args, decryptor, examine_word_order, join_engine, budget)
+    finally:
+        decryptor.close()
 
-    from decryptor.decryptor import SscDecryptor
-    decryptor = SscDecryptor(decryptor_log_level)
+
+def _decrypt_message(args: argparse.Namespace, decryptor: SscDecryptor, examine_word_order: ExamineOrder, join_engine: JoinEngine, budget: DeductionBudget) -> None:
+    """Decrypts the message or message file and prints the alphabets table and the decrypted message."""
+    suppress_encrypted_text_output = args.suppress_encrypted_text_output
 
     # Get the encrypted message text.
     encrypted_message = _get_encrypted_message(args)
@@ -46,10 +75,12 @@ def main(args):
     begin_decrypt = time.perf_counter()
 
     # Invoke the main decryptor function.
-    alphabets_map = decryptor.deduce_ciphertext_alphabet(encrypted_message, examine_word_order)
+    alphabets_map = decryptor.deduce_ciphertext_alphabet(encrypted_message, examine_word_order, join_engine, budget=budget, search_mode=SearchMode[args.search],
+                                                         confirm_unique=args.confirm_unique)
 
     # Print the alphabets table.
     _print_alphabets(alphabets_map)
+    _log_deduction_summary(decryptor)
 
     # Decrypt (translate) the message.
     decrypted_message = decryptor.decrypt_message(encrypted_message, alphabets_map)
@@ -68,53 +99,34 @@ def main(args):
     logger.info("")
 
 
-def _load_plaintext_words(words_file: str) -> list:
-    with codecs.open(words_file, 'r', encoding='utf-8', errors="ignore") as words:
-        return [word.rstrip().translate(str.maketrans('', '', string.punctuation)) for word in words]
-
+def _decrypt_group(args: argparse.Namespace, decryptor: SscDecryptor, examine_word_order: ExamineOrder, join_engine: JoinEngine, budget: DeductionBudget) -> None:
+    """Deduces one alphabets map for the group of messages, and prints the alphabets table and each decrypted message."""
+    messages = list(read_messages(args.group))
 
-def _build_word_patterns_module(words_files: list, module_file: str) -> types.ModuleType:
-    """Generate patterns for all dictionary words and returns as a Python module"""
-    module_name = ('.').join(module_file.split('.')[:-1])
-    module_name = module_name.replace('/', '.')
-
-    wordpatterns = None
-    if os.path.exists(module_file):
-        wordpatterns = importlib.import_module(module_name)
+    logger.info(f"Decrypting a group of {len(messages)} messages...\n")
+    begin_decrypt = time.perf_counter()
 
-        if len(words_files) == len(set(words_files).intersection(wordpatterns.words_files)):
-            return wordpatterns
-        else:
-            os.remove(module_file)
+    alphabets_map = decryptor.deduce_group_alphabet([encrypted_message for _, encrypted_message in messages], examine_word_order, join_engine, budget=budget,
+                                                    search_mode=SearchMode[args.search], confirm_unique=args.confirm_unique)
 
-    words = list()
-    for words_file in words_files:
-        words.extend(_load_plaintext_words(words_file))
+    _print_alphabets(alphabets_map)
+    _log_deduction_summary(decryptor)
 
-    # Remove any duplicates.
-    words = list(dict.fromkeys(words))
+    decrypted_messages = [decryptor.decrypt_message(encrypted_message, alphabets_map) for _, encrypted_message in messages]
 
-    # Generate the patterns.
-    patterns = dict()
-    for word in words:
-        pattern = StringPattern(word).get_pattern()
-        if pattern not in patterns:
-            patterns[pattern] = list()
+    end_decrypt = time.perf_counter()
 
-        patterns[pattern].append(word.upper())
+    logger.info(f"Total time to decrypt: {end_decrypt - begin_decrypt:0.4f} seconds")
 
-    # Write to a new module.
-    wordpatterns_module = open(module_file, 'w')
-    wordpatterns_module.write(f"words_files = {pprint.pformat(words_files)}\n")
-    wordpatterns_module.write(f"patterns = {pprint.pformat(patterns)}")
-    wordpatterns_module.close()
+    for (source, encrypted_message), decrypted_message in zip(messages, decrypted_messages):
+        if not args.suppress_encrypted_text_output:
+            logger.info(_bold_string(f"\nEncrypted message ({source}):"))
+            logger.info(encrypted_message)
 
-    if wordpatterns is not None:
-        wordpatterns = importlib.reload(wordpatterns)
-    else:
-        wordpatterns = importlib.import_module(module_name)
+        logger.info(_bold_string(f"\nDecrypted message ({source}):"))
+        logger.info(decrypted_message)
 
-    return wordpatterns
+    logger.info("")
 
 
 def _print_alphabets(alphabets_map: dict) -> None:
@@ -135,17 +147,69 @@ def _print_alphabets(alphabets_map: dict) -> None:
     logger.info(tableformatter.generate_table(rows, columns)+"\033[0m")
 
 
+def _log_deduction_summary(decryptor: SscDecryptor) -> None:
+    if decryptor.last_stats.cached_key:
+        logger.info(_bold_string("The alphabets are a key from the key cache.\n"))
+
+    if decryptor.last_stats.truncated:
+        logger.info(_bold_string(f"Decryption cut short ({decryptor.last_stats.truncated_reason}). The alphabets are from the words examined so far.\n"))
+
+
+def _decrypt_batch(args: argparse.Namespace, decryptor_log_level: int, examine_word_order: ExamineOrder, join_engine: JoinEngine, budget: DeductionBudget) -> None:
+    """Decrypts every message of the batch sources and writes one JSON result per line."""
+    output = args.output if args.output is not None else sys.stdout
+    messages = read_messages(args.batch)
+
+    for result in decrypt_messages(messages, WORD_INDEX_FILE, decryptor_log_level, examine_word_order, join_engine, args.workers, budget,
+                                   SearchMode[args.search], args.confirm_unique):
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+
+
+def _decrypt_stream(args: argparse.Namespace, decryptor: SscDecryptor, examine_word_order: ExamineOrder, join_engine: JoinEngine, budget: DeductionBudget) -> None:
+    """Decrypts the stream source chunk by chunk and writes the decrypted text to the output."""
+    output = args.output if args.output is not None else sys.stdout
+
+    begin_decrypt = time.perf_counter()
+    alphabets_map = decryptor.decrypt_stream(args.stream, output, examine_word_order, join_engine, budget=budget, search_mode=SearchMode[args.search],
+                                             confirm_unique=args.confirm_unique)
+    output.flush()
+    end_decrypt = time.perf_counter()
+
+    # Only print the alphabets table and timing if they won't be mixed into the decrypted text.
+    if output is not sys.stdout:
+        _print_alphabets(alphabets_map)
+        _log_deduction_summary(decryptor)
+        logger.info(f"Total time to decrypt: {end_decrypt - begin_decrypt:0.4f} seconds")
+
+
+def _serve(args: argparse.Namespace, decryptor_log_level: int, examine_word_order: ExamineOrder, join_engine: JoinEngine, budget: DeductionBudget) -> None:
+    """Runs the decryption service until interrupted."""
+    host, _, port = args.serve.rpartition(':')
+    server = DecryptionServer((host or '127.0.0.1', int(port)), WORD_INDEX_FILE, decryptor_log_level, examine_word_order, join_engine, args.workers, budget,
+                              SearchMode[args.search], args.confirm_unique)
+
+    logger.info(f"Serving on http://{server.server_address[0]}:{server.server_address[1]} with {server.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def _get_budget(args: argparse.Namespace) -> DeductionBudget:
+    """Returns the budget given by the limit arguments, or None if there aren't any."""
+    if args.deadline is None and args.max_tuples is None and args.max_memory is None:
+        return None
+
+    return DeductionBudget(args.deadline, args.max_tuples, args.max_memory * 1024 * 1024 if args.max_memory is not None else None)
+
+
 def _get_encrypted_message(args: argparse.Namespace) -> str:
     encrypted_message = str()
     if args.message_file is not None:
-        for line in args.message_file.readlines():
-            # Ignore blank lines before we get to any text.
-            if len(encrypted_message) == 0 and len(line.lstrip()) == 0:
-                continue
-
-            # Ignore commented lines.
-            if not line.startswith("#"):
-                encrypted_message += line
+        encrypted_message = read_encrypted_message(args.message_file)
     else:
         encrypted_message = args.message
 
@@ -163,6 +227,25 @@ if __name__ == '__main__':
     msg_group = parser.add_mutually_exclusive_group()
     msg_group.add_argument("-m", "--message", help="An encrypted message")
     msg_group.add_argument("-f", "--message-file", type=argparse.FileType("r"), help="An encrypted message text file")
+    msg_group.add_argument("-b", "--batch", nargs='+', metavar="SOURCE",
+                           help="Decrypts a batch of messages and outputs JSON lines. A source can be a message file, a directory of .txt message files, a glob pattern, or - to read one message per line from stdin")
+
+    msg_group.add_argument("-g", "--group", nargs='+', metavar="SOURCE",
+                           help="Decrypts a group of messages known to share a key, deducing one alphabet from all of them. Sources are given as for --batch")
+    msg_group.add_argument("--stream", metavar="FILE", type=argparse.FileType("r"),
+                           help="Decrypts a large encrypted text file chunk by chunk, deducing the key from a leading sample, or - to read from stdin")
+    msg_group.add_argument("--serve", metavar="[HOST:]PORT", help="Runs a decryption service with a warm word index. Example: --serve 127.0.0.1:8080")
+
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes used in batch and service modes (default: number of CPUs)")
+    parser.add_argument("--join-workers", type=int, default=1,
+                        help="Number of processes that large joins are split across when decrypting a message or stream (default: 1)")
+    parser.add_argument("--output", type=argparse.FileType("w"), default=None, help="Batch and stream mode output file (default: stdout)")
+
+    parser.add_argument("--deadline", type=float, default=None, metavar="SECONDS",
+                        help="Stops a decryption after this many seconds and outputs the alphabets deduced so far")
+    parser.add_argument("--max-tuples", type=int, default=None, help="Stops a decryption after this many tuples and outputs the alphabets deduced so far")
+    parser.add_argument("--max-memory", type=int, default=None, metavar="MB",
+                        help="Stops a decryption once the process uses this much memory and outputs the alphabets deduced so far")
 
     verbosity_group = parser.add_mutually_exclusive_group()
     verbosity_group.add_argument("-v", "--verbose-info", default=False, action="store_true", help="Makes the decryptor output more verbose")
@@ -171,8 +254,21 @@ if __name__ == '__main__':
     parser.add_argument("-s", "--suppress-encrypted-text-output", default=False, action="store_true", help="Suppresses the encrypted text from the output")
     parser.add_argument('-w', '--words-files', action='store', type=str, nargs='*', default=['words/dictionary.txt'],
                         help="Dictionary (words) files. Example: -w words/dictionary.txt words/names.txt")
+    parser.add_argument("--index-workers", type=int, default=None, help="Number of processes used to index new or changed words files (default: number of CPUs)")
     parser.add_argument("-o", "--order", default="LONGEST_TO_SHORTEST", choices=[e.name for e in ExamineOrder], help="The word examine order")
+    parser.add_argument("--search", default="EXHAUSTIVE", choices=[e.name for e in SearchMode],
+                        help="MOST_LIKELY_FIRST returns the first key found by trying the most frequent words first, falling back to EXHAUSTIVE")
+    parser.add_argument("--confirm-unique", default=False, action="store_true", help="Only returns a MOST_LIKELY_FIRST key if no other key is found")
+    parser.add_argument("--frequency-file", default=None,
+                        help="Word frequencies used to weight the dictionary words, one word per line, most frequent first or followed by a count. Example: --frequency-file words/frequencies.txt")
+    parser.add_argument("--key-cache", metavar="FILE", default=None,
+                        help="A JSON file of recovered keys that are tried before deducing a new key, and that new keys are added to. Example: --key-cache keys.json")
+    parser.add_argument("-e", "--join-engine", default="VECTORIZED", choices=[e.name for e in JoinEngine], help="The engine used to join the plaintext matches of the examined words")
 
     args = parser.parse_args()
 
+    # The most likely key can only be found with the word weights of a frequency file.
+    if args.search == SearchMode.MOST_LIKELY_FIRST.name and args.frequency_file is None:
+        parser.error("--search MOST_LIKELY_FIRST requires --frequency-file")
+
     main(args)
@@ -0,0 +1,123 @@
+import asyncio
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+
+from decryptor.budget import DeductionBudget
+from decryptor.decryptor import SscDecryptor
+from decryptor.examineorder import ExamineOrder
+from decryptor.joinengine import JoinEngine
+from decryptor.searchmode import SearchMode
+from decryptor.wordindex import WordIndex
+
+# Seconds that a call with a timeout waits past it for the deduction to stop at its deadline and return the alphabets
+# map built so far, before the call gives up on it and raises asyncio.TimeoutError.
+TIMEOUT_GRACE_SECONDS = 1.0
+
+# The decryptor of the current worker process or thread.
+_local = threading.local()
+
+class AsyncSscDecryptor:
+    """
+    An asyncio front end to SscDecryptor for embedding in async services. Deductions run in a pool of worker processes
+    (or threads, with use_threads), each with its own decryptor and log level, so the event loop isn't blocked. At most
+    max_concurrency calls run at once (default: one per worker), and the others wait for a turn.
+
+    A call's timeout becomes the deadline of its budget, counted from when the call gets its turn, so a deduction that
+    runs out of time returns the alphabets map built from the words examined so far. Cancelling the awaiting task
+    cancels the deduction at its next check of the budget.
+    """
+
+    def __init__(self, index_file: str, log_level: int = logging.WARN, workers: int = None, max_concurrency: int = None, use_threads: bool = False):
+        self.workers = workers if workers is not None else os.cpu_count()
+        self.max_concurrency = max_concurrency if max_concurrency is not None else self.workers
+        self.__semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        if use_threads:
+            # The threads share one memory-mapped word index.
+            self.__executor = concurrent.futures.ThreadPoolExecutor(self.workers, initializer=_init_worker, initargs=(WordIndex(index_file), log_level))
+            self.__manager = None
+        else:
+            self.__executor = concurrent.futures.ProcessPoolExecutor(self.workers, initializer=_init_process_worker, initargs=(index_file, log_level))
+
+            # Serves the events that cancel deductions running in the worker processes.
+            self.__manager = multiprocessing.Manager()
+
+    async def __aenter__(self) -> 'AsyncSscDecryptor':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    def close(self) -> None:
+        """Shuts down the workers, cancelling the calls that haven't started."""
+        self.__executor.shutdown(cancel_futures=True)
+        if self.__manager is not None:
+            self.__manager.shutdown()
+            self.__manager = None
+
+    async def deduce_ciphertext_alphabet(self, encrypted_message: str, examine_word_order: ExamineOrder = ExamineOrder.LONGEST_TO_SHORTEST,
+                                         join_engine: JoinEngine = JoinEngine.VECTORIZED, timeout: float = None, budget: DeductionBudget = None,
+                                         search_mode: SearchMode = SearchMode.EXHAUSTIVE, confirm_unique: bool = False) -> dict:
+        """Returns the alphabets map deduced by SscDecryptor.deduce_ciphertext_alphabet in a worker."""
+        alphabets_map, _ = await self.deduce_with_stats(encrypted_message, examine_word_order, join_engine, timeout, budget, search_mode, confirm_unique)
+
+        return alphabets_map
+
+    async def deduce_with_stats(self, encrypted_message: str, examine_word_order: ExamineOrder = ExamineOrder.LONGEST_TO_SHORTEST,
+                                join_engine: JoinEngine = JoinEngine.VECTORIZED, timeout: float = None, budget: DeductionBudget = None,
+                                search_mode: SearchMode = SearchMode.EXHAUSTIVE, confirm_unique: bool = False) -> tuple:
+        """
+        Returns the alphabets map and the DeductionStats of a deduction in a worker. The limits of the budget, if any,
+        apply to the call along with the timeout; the budget itself isn't used, so one budget can be given to many calls.
+        """
+        deadline = budget.deadline if budget is not None else None
+        if timeout is not None:
+            deadline = min(deadline, timeout) if deadline is not None else timeout
+
+        async with self.__semaphore:
+            cancel_event = self.__manager.Event() if self.__manager is not None else threading.Event()
+            call_budget = DeductionBudget(deadline, budget.max_tuples if budget is not None else None, budget.max_memory if budget is not None else None, cancel_event)
+
+            return await self.__run(cancel_event, timeout + TIMEOUT_GRACE_SECONDS if timeout is not None else None, _deduce, encrypted_message,
+                                    examine_word_order, join_engine, call_budget, search_mode, confirm_unique)
+
+    async def decrypt_message(self, encrypted_message: str, alphabets_map: dict) -> str:
+        """Decrypts an encrypted string using the given alphabets_map in a worker."""
+        async with self.__semaphore:
+            return await self.__run(None, None, _decrypt, encrypted_message, alphabets_map)
+
+    async def __run(self, cancel_event, timeout: float, function, *args):
+        """Runs the function in the executor, setting the cancel event if the call times out or is cancelled."""
+        future = asyncio.get_running_loop().run_in_executor(self.__executor, function, *args)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            if cancel_event is not None:
+                cancel_event.set()
+            raise
+
+
+def _init_process_worker(index_file: str, log_level: int) -> None:
+    # Interrupts are handled by the parent process.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _init_worker(WordIndex(index_file), log_level)
+
+
+def _init_worker(word_index: WordIndex, log_level: int) -> None:
+    _local.decryptor = SscDecryptor(log_level, word_index)
+
+
+def _deduce(encrypted_message: str, examine_word_order: ExamineOrder, join_engine: JoinEngine, budget: DeductionBudget, search_mode: SearchMode,
+            confirm_unique: bool) -> tuple:
+    alphabets_map = _local.decryptor.deduce_ciphertext_alphabet(encrypted_message, examine_word_order, join_engine, budget=budget, search_mode=search_mode,
+                                                                confirm_unique=confirm_unique)
+
+    return alphabets_map, _local.decryptor.last_stats
+
+
+def _decrypt(encrypted_message: str, alphabets_map: dict) -> str:
+    return _local.decryptor.decrypt_message(encrypted_message, alphabets_map)
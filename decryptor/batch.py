@@ -0,0 +1,128 @@
+import glob
+import io
+import multiprocessing
+import os
+import signal
+import sys
+import time
+
+from decryptor.budget import DeductionBudget
+from decryptor.decryptor import SscDecryptor
+from decryptor.examineorder import ExamineOrder
+from decryptor.joinengine import JoinEngine
+from decryptor.searchmode import SearchMode
+from decryptor.wordindex import WordIndex
+
+# The decryptor of the current process. Set in the parent before the pool is created, so forked workers inherit it (and
+# the pages of its memory-mapped word index) copy-on-write, or created by each worker when processes are spawned.
+_decryptor = None
+
+def decrypt_messages(messages, index_file: str, log_level: int, examine_word_order: ExamineOrder, join_engine: JoinEngine, workers: int = None,
+                     budget: DeductionBudget = None, search_mode: SearchMode = SearchMode.EXHAUSTIVE, confirm_unique: bool = False):
+    """
+    Decrypts (source, encrypted message) pairs across a pool of worker processes, loading the word index once. Yields a
+    result dict for each message, in the order the messages were given. The budget, if any, applies to each message.
+    """
+    tasks = ((source, encrypted_message, examine_word_order, join_engine, budget, search_mode, confirm_unique) for source, encrypted_message in messages)
+
+    if workers == 1:
+        _init_worker(index_file, log_level)
+        yield from map(decrypt_task, tasks)
+        return
+
+    with create_worker_pool(index_file, log_level, workers) as pool:
+        yield from pool.imap(decrypt_task, tasks)
+
+
+def create_worker_pool(index_file: str, log_level: int, workers: int = None) -> multiprocessing.Pool:
+    """
+    Returns a pool of worker processes for decrypt_task. The word index is opened in this process before the pool is
+    created, so that forked workers inherit it.
+    """
+    _init_worker(index_file, log_level)
+
+    return multiprocessing.Pool(workers, initializer=_init_pool_worker, initargs=(index_file, log_level))
+
+
+def decrypt_task(task: tuple) -> dict:
+    """
+    Decrypts a (source, encrypted message, examine word order, join engine, budget, search mode, confirm unique) task
+    with the decryptor of the current process. Returns a result dict with the alphabets map, the decrypted message and
+    stats, or an error.
+    """
+    source, encrypted_message, examine_word_order, join_engine, budget, search_mode, confirm_unique = task
+
+    try:
+        begin_decrypt = time.perf_counter()
+        alphabets_map = _decryptor.deduce_ciphertext_alphabet(encrypted_message, examine_word_order, join_engine, budget=budget, search_mode=search_mode,
+                                                              confirm_unique=confirm_unique)
+        decrypted_message = _decryptor.decrypt_message(encrypted_message, alphabets_map)
+        end_decrypt = time.perf_counter()
+    except Exception as exception:
+        return {'source': source, 'error': repr(exception)}
+
+    return {
+        'source': source,
+        'alphabets_map': dict(alphabets_map),
+        'decrypted_message': decrypted_message,
+        'stats': {
+            'seconds': round(end_decrypt - begin_decrypt, 6),
+            'tuples_examined': _decryptor.last_stats.total_tuples_compared,
+            'truncated': _decryptor.last_stats.truncated,
+            'truncated_reason': _decryptor.last_stats.truncated_reason,
+            'most_likely_key': _decryptor.last_stats.most_likely_key,
+            'worker_pid': os.getpid(),
+        },
+    }
+
+
+def read_messages(sources: list):
+    """
+    Yields (source, encrypted message) pairs for the given sources. A source can be a message file, a directory (every
+    .txt file in it), a glob pattern, or '-' to read one message per line from stdin.
+    """
+    for source in sources:
+        if source == '-':
+            for line_number, line in enumerate(sys.stdin, start=1):
+                if len(line.strip()) > 0:
+                    yield f"<stdin>:{line_number}", line.rstrip('\n')
+            continue
+
+        if os.path.isdir(source):
+            message_files = sorted(glob.glob(os.path.join(source, '*.txt')))
+        elif os.path.isfile(source):
+            message_files = [source]
+        else:
+            message_files = sorted(glob.glob(source))
+
+        for message_file in message_files:
+            with open(message_file, 'r', encoding='utf-8') as message:
+                yield message_file, read_encrypted_message(message)
+
+
+def read_encrypted_message(message_file: io.TextIOBase) -> str:
+    """Reads an encrypted message text file, ignoring blank lines before any text and commented (#) lines."""
+    encrypted_message = str()
+    for line in message_file.readlines():
+        # Ignore blank lines before we get to any text.
+        if len(encrypted_message) == 0 and len(line.lstrip()) == 0:
+            continue
+
+        # Ignore commented lines.
+        if not line.startswith("#"):
+            encrypted_message += line
+
+    return encrypted_message
+
+
+def _init_pool_worker(index_file: str, log_level: int) -> None:
+    # Interrupts are handled by the parent process, which terminates the pool.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _init_worker(index_file, log_level)
+
+
+def _init_worker(index_file: str, log_level: int) -> None:
+    global _decryptor
+    if _decryptor is None:
+        _decryptor = SscDecryptor(log_level, WordIndex(index_file))
+
@@ -0,0 +1,99 @@
+import os
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+class BudgetExceeded(Exception):
+    """Raised by DeductionBudget.check when a limit has been hit or the deduction has been cancelled."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class DeductionBudget:
+    """
+    Optional limits for one call to deduce_ciphertext_alphabet: a wall-clock deadline in seconds from the start of the
+    deduction, a maximum number of tuples compared, and a maximum resident memory of the process in bytes. The joins
+    check the budget regularly, and cancel() can be called from another thread to stop the deduction at the next check.
+    A deduction that is stopped returns the alphabets map built from the words examined so far.
+
+    To cancel a deduction running in another process, give the budget a cancel_event shared with that process, such as
+    a multiprocessing.Manager().Event(). It is sent along with the budget, and set by cancel().
+    """
+
+    def __init__(self, deadline: float = None, max_tuples: int = None, max_memory: int = None, cancel_event=None):
+        self.deadline = deadline
+        self.max_tuples = max_tuples
+        self.max_memory = max_memory
+
+        self.__cancel_event = cancel_event
+        self.__cancelled = cancel_event if cancel_event is not None else threading.Event()
+        self.__started = time.perf_counter()
+        self.__tuples_compared = 0
+
+    def __getstate__(self) -> dict:
+        # Budgets are sent to other processes without their own cancelled event, which the parent process checks instead.
+        return {'deadline': self.deadline, 'max_tuples': self.max_tuples, 'max_memory': self.max_memory, 'cancel_event': self.__cancel_event}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(**state)
+
+    def start(self) -> None:
+        """Starts the deadline and the tuple count. Cancellation isn't reset, so a budget cancelled early stays cancelled."""
+        self.__started = time.perf_counter()
+        self.__tuples_compared = 0
+
+    def cancel(self) -> None:
+        self.__cancelled.set()
+
+    def is_cancelled(self) -> bool:
+        return self.__cancelled.is_set()
+
+    def add_tuples(self, tuples_compared: int) -> None:
+        """Adds the tuples compared by a finished join."""
+        self.__tuples_compared += tuples_compared
+
+    def remaining(self, shares: int = 1) -> 'DeductionBudget':
+        """
+        Returns a new budget for what is left of this one, e.g. for a join run in another process. The tuples left are
+        split into equal shares, so that as many joins run at once can't compare more tuples between them.
+        """
+        deadline = max(self.deadline - (time.perf_counter() - self.__started), 0.0) if self.deadline is not None else None
+        max_tuples = max(self.max_tuples - self.__tuples_compared, 0) // shares if self.max_tuples is not None else None
+
+        return DeductionBudget(deadline, max_tuples, self.max_memory, self.__cancel_event)
+
+    def check(self, join_tuples_compared: int = 0) -> None:
+        """Raises BudgetExceeded if a limit has been hit, counting the tuples compared so far by a running join."""
+        if self.__cancelled.is_set():
+            raise BudgetExceeded("cancelled")
+
+        if self.deadline is not None and time.perf_counter() - self.__started > self.deadline:
+            raise BudgetExceeded("deadline")
+
+        if self.max_tuples is not None and self.__tuples_compared + join_tuples_compared > self.max_tuples:
+            raise BudgetExceeded("max tuples")
+
+        if self.max_memory is not None and _resident_memory() > self.max_memory:
+            raise BudgetExceeded("max memory")
+
+
+def _resident_memory() -> int:
+    """Returns the resident memory of the process in bytes, or its peak where the current size isn't available."""
+    try:
+        with open('/proc/self/statm', 'r') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+
+    if resource is None:
+        return 0
+
+    # ru_maxrss is in kilobytes on Linux, and in bytes on macOS.
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if os.uname().sysname == 'Darwin' else max_rss * 1024
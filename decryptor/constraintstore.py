@@ -0,0 +1,110 @@
+import collections
+
+import numpy as np
+
+class ConstraintStore:
+    """
+    The plaintext letters that each encrypted letter can still map to, as a bitmask per encrypted letter where bit n is
+    set if the plaintext letter with code point n is allowed. The masks are narrowed to the letters of the deducted
+    plaintext matches, and then by all-different reasoning: a simple substitution cipher maps each plaintext letter to
+    one encrypted letter, so if k encrypted letters can only map to the same k plaintext letters, no other encrypted
+    letter can map to them. Encrypted letters without a mask can map to any plaintext letter that isn't taken that way.
+    """
+
+    def __init__(self):
+        # Key = encrypted letter, value = bitmask of the plaintext letters it can map to.
+        self.__allowed = dict()
+
+        # Bitmask of the plaintext letters taken by groups of encrypted letters.
+        self.__taken = 0
+
+    def is_constrained(self, encrypted_letter: str) -> bool:
+        return encrypted_letter in self.__allowed
+
+    def get_masks(self, encrypted_word: str) -> tuple:
+        """
+        Returns the mask of each unique encrypted letter in the word, or the complement of the taken letters for an
+        encrypted letter without a mask. The plaintext matches that filter() keeps for the word only change with these.
+        """
+        return tuple(self.__allowed.get(encrypted_letter, ~self.__taken) for encrypted_letter in dict.fromkeys(encrypted_word))
+
+    def get_known_letters(self, encrypted_word: str) -> dict:
+        """
+        Returns a dict of the positions (keys) of the encrypted letters in the word that can only map to one plaintext
+        letter, and the code points of those plaintext letters (values). Only the first position of each letter is given.
+        """
+        known_letters = dict()
+        for encrypted_letter in dict.fromkeys(encrypted_word):
+            mask = self.__allowed.get(encrypted_letter, 0)
+            if mask > 0 and mask & (mask - 1) == 0:
+                known_letters[encrypted_word.index(encrypted_letter)] = mask.bit_length() - 1
+
+        return known_letters
+
+    def restrict(self, encrypted_words: list, plaintext_letters: list) -> None:
+        """
+        Narrows the encrypted letters of each word to the letters at the same positions of its plaintext matches, given as
+        a (matches, word length) array of code points per word, then applies all-different reasoning.
+        """
+        for encrypted_word, letters in zip(encrypted_words, plaintext_letters):
+            for encrypted_letter in dict.fromkeys(encrypted_word):
+                position = encrypted_word.index(encrypted_letter)
+                mask = self.__letters_to_mask(letters[:, position])
+                self.__allowed[encrypted_letter] = self.__allowed.get(encrypted_letter, ~self.__taken) & mask
+
+        self.__propagate_all_different()
+
+    def filter(self, encrypted_word: str, plaintext_letters: np.ndarray) -> np.ndarray:
+        """
+        Returns a boolean array of the plaintext matches, given as a (matches, word length) array of code points, that
+        are consistent with the allowed letters of every encrypted letter in the word.
+        """
+        consistent = np.ones(len(plaintext_letters), dtype=bool)
+
+        for encrypted_letter in dict.fromkeys(encrypted_word):
+            position = encrypted_word.index(encrypted_letter)
+            if encrypted_letter in self.__allowed:
+                consistent &= self.__in_mask(plaintext_letters[:, position], self.__allowed[encrypted_letter])
+            elif self.__taken != 0:
+                consistent &= ~self.__in_mask(plaintext_letters[:, position], self.__taken)
+
+        return consistent
+
+    def __propagate_all_different(self) -> None:
+        """Removes the plaintext letters taken by a group of encrypted letters from every other encrypted letter."""
+        changed = True
+        while changed:
+            changed = False
+
+            # A group is k encrypted letters with the same mask of k plaintext letters.
+            group_sizes = collections.Counter(self.__allowed.values())
+            groups = [mask for mask, size in group_sizes.items() if bin(mask).count('1') == size]
+
+            for group in groups:
+                for encrypted_letter, mask in self.__allowed.items():
+                    if mask != group and mask & group != 0:
+                        self.__allowed[encrypted_letter] = mask & ~group
+                        changed = True
+
+            for group in groups:
+                self.__taken |= group
+
+    @staticmethod
+    def __letters_to_mask(letters: np.ndarray) -> int:
+        mask = 0
+        for code_point in np.unique(letters):
+            mask |= 1 << int(code_point)
+
+        return mask
+
+    @staticmethod
+    def __in_mask(letters: np.ndarray, mask: int) -> np.ndarray:
+        """Returns a boolean array of the code points that are set in the mask."""
+        if mask <= 0:
+            return np.zeros(len(letters), dtype=bool)
+
+        mask_bytes = np.frombuffer(mask.to_bytes((mask.bit_length() + 7) // 8, 'little'), dtype=np.uint8)
+        lookup = np.unpackbits(mask_bytes, bitorder='little').astype(bool)
+        in_lookup = letters < len(lookup)
+
+        return in_lookup & lookup[np.where(in_lookup, letters, 0)]
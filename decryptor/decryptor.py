@@ -1,8 +1,9 @@
 import argparse
 import codecs
 import importlib
-import itertools
+import io
 import logging
+import math
 import os
 import pprint
 import re
@@ -10,36 +11,141 @@ import string
 import sys
 import time
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
 import tableformatter
 from unidecode import unidecode
 
-import decryptor.wordpatterns as wordpatterns
+from decryptor import join
+from decryptor.budget import BudgetExceeded, DeductionBudget
+from decryptor.constraintstore import ConstraintStore
+from decryptor.deductionstats import DeductionHooks, DeductionStats, IterationStats
 from decryptor.examineorder import ExamineOrder
+from decryptor.joinengine import JoinEngine
+from decryptor.keycache import KeyCache
+from decryptor.searchmode import SearchMode
 from decryptor.stringpattern import StringPattern
+from decryptor.wordindex import WordIndex
 
 logging.basicConfig(format="%(message)s", stream=sys.stdout)
 logger = logging.getLogger("decryptor")
 
+# Number of characters of a stream that the alphabets map is first deduced from.
+STREAM_SAMPLE_SIZE = 64 * 1024
+
+# Maximum number of characters of a stream that the alphabets map is deduced from.
+MAX_STREAM_SAMPLE_SIZE = 1024 * 1024
+
+# Number of characters of a stream that are translated at a time.
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Minimum size of the cartesian product of a join for it to be split into shards across the join workers.
+PARALLEL_JOIN_MIN_TUPLES = 1 << 20
+
+# Number of shards per join worker, so that workers given quick shards can take on more.
+PARALLEL_JOIN_SHARDS_PER_WORKER = 4
+
+# Maximum number of plaintext matches examined by the MOST_LIKELY_FIRST search before the exhaustive deduction is used.
+MOST_LIKELY_MAX_CANDIDATES = 1 << 20
+
+# Minimum fraction of the encrypted words with plaintext matches that must decrypt to dictionary words under a cached
+# key for the key to be used without a deduction.
+KEY_CACHE_MIN_SCORE = 0.9
+
+def get_level_logger(log_level: int) -> logging.Logger:
+    """Returns the child of the package logger for the log level, e.g. decryptor.info, set to that level."""
+    level_logger = logger.getChild(logging.getLevelName(log_level).lower().replace(' ', ''))
+    level_logger.setLevel(log_level)
+
+    return level_logger
+
 class SscDecryptor:
 
-    def __init__(self, log_level: int):
-        logger.setLevel(log_level)
+    # Join engine implementations.
+    __JOINS = {
+        JoinEngine.PRODUCT: join.product_join,
+        JoinEngine.BACKTRACKING: join.backtracking_join,
+        JoinEngine.VECTORIZED: join.vectorized_join,
+    }
 
-    def deduce_ciphertext_alphabet(self, encrypted_message: str, examine_word_order: ExamineOrder) -> dict:
+    def __init__(self, log_level: int, word_index: WordIndex, join_workers: int = 1, key_cache: KeyCache = None):
+        # Decryptors log through a child of the package logger named after their log level, so that decryptors with
+        # different log levels can be used side by side without changing any logger they share.
+        self.__logger = get_level_logger(log_level)
+
+        # Dictionary words interned into word IDs. Plaintext matches are handled as arrays of word IDs.
+        self.__word_index = word_index
+
+        # Number of processes that large joins are sharded across, and their pool (created on first use).
+        self.__join_workers = join_workers if join_workers is not None else os.cpu_count()
+        self.__join_executor = None
+
+        # Keys recovered by earlier deductions, which are tried before deducing a new one.
+        self.__key_cache = key_cache
+
+        # Stats of the last call to deduce_ciphertext_alphabet.
+        self.last_stats = None
+
+    def deduce_ciphertext_alphabet(self, encrypted_message: str, examine_word_order: ExamineOrder, join_engine: JoinEngine = JoinEngine.VECTORIZED,
+                                   hooks: DeductionHooks = None, budget: DeductionBudget = None, search_mode: SearchMode = SearchMode.EXHAUSTIVE,
+                                   confirm_unique: bool = False) -> dict:
         """
         Each encrypted word from an encrypted message will have zero or more matching plaintext words that share the same 
         word pattern. This function attempts to decipher encrypted messages by reducing the number of plaintext matches 
-        for each encrypted word to one (ideally).
+        for each encrypted word to one (ideally). The join engine determines how the plaintext matches of the examined
+        words are searched for consistent tuples; every engine deducts the same plaintext matches. The stats of the
+        deduction are passed to the hooks at each stage, and kept in last_stats.
+
+        If the budget runs out (or is cancelled), the deduction stops and the alphabets map is built from the words
+        examined so far, with the letters of the other words unknown, and last_stats.truncated is set.
+
+        The MOST_LIKELY_FIRST search mode first searches every word at once, trying the most frequent plaintext matches
+        first, and returns the first key that is consistent with every word that has plaintext matches. With
+        confirm_unique, the key is only returned if the search finds no other. The exhaustive deduction is used if no
+        key is found (or confirmed) within MOST_LIKELY_MAX_CANDIDATES plaintext matches, or if the word index has no
+        word weights. Plaintext matches that contain digits aren't searched, as the encrypted words are all letters.
+
+        If the decryptor has a key cache, a cached key is returned without a deduction if enough of the encrypted words
+        decrypt to dictionary words under it (see KEY_CACHE_MIN_SCORE), and last_stats.cached_key is set. Otherwise the
+        resolved letters of the deduced key are added to the cache, unless the deduction was cut short.
         """
+        hooks = hooks if hooks is not None else DeductionHooks()
+        stats = DeductionStats(examine_word_order.name, join_engine.name, search_mode.name)
+        begin_deduction = time.perf_counter()
+        pattern_cache_hits = StringPattern.cached.cache_info().hits
+
+        if budget is not None:
+            budget.start()
+
         # Get the normalised encrypted words from the encrypted message text.
         encrypted_words = self.__get_normalised_encrypted_words(encrypted_message)
-        logger.info(f"Normalised encrypted words: {encrypted_words}\n")
+        self.__logger.info("Normalised encrypted words: %s\n", encrypted_words)
 
         # This is how many unique alphabetic characters we need to decipher.
         unique_encrypted_characters = self.__unique_alpha_chars_in_string(''.join(encrypted_words))
-        logger.info(f"Unique alphabetic characters: {unique_encrypted_characters}\n")
+        self.__logger.info("Unique alphabetic characters: %d\n", unique_encrypted_characters)
+
+        stats.encrypted_words = len(encrypted_words)
+        stats.unique_letters = unique_encrypted_characters
+        hooks.on_start(stats)
+
+        if self.__key_cache is not None:
+            cached = self.__find_cached_alphabets(encrypted_words, stats)
+            if cached is not None:
+                alphabets_map, unmatched_encrypted_words = cached
+                return self.__finish_deduction(alphabets_map, unmatched_encrypted_words, stats, begin_deduction, pattern_cache_hits, hooks)
+
+        if search_mode == SearchMode.MOST_LIKELY_FIRST and not self.__word_index.has_weights():
+            # Without weights, every plaintext match is as likely as any other, so the first key found isn't the most likely.
+            self.__logger.warning("The word index has no word weights. Using the exhaustive deduction instead of MOST_LIKELY_FIRST.")
+        elif search_mode == SearchMode.MOST_LIKELY_FIRST:
+            most_likely = self.__find_most_likely_alphabets(encrypted_words, confirm_unique, stats, budget)
+            if most_likely is not None:
+                alphabets_map, unmatched_encrypted_words = most_likely
+                return self.__finish_deduction(alphabets_map, unmatched_encrypted_words, stats, begin_deduction, pattern_cache_hits, hooks)
+
+            self.__logger.info("\nNo most likely key found. Continuing with the exhaustive deduction.")
 
         # Get a map of encrypted words (keys) and plaintext matches (values) in the desired key order.
         # The value for each key may be 'None' if the order doesn't require pre-fetching of the plaintext matches.
@@ -54,179 +160,529 @@ class SscDecryptor:
         # Working map of plaintext matches for each encrypted word, that will reduce as accuracy improves.
         deducted_plaintext_matches = dict()
 
-        # Counter for the number of cartesian product tuples compared.
-        total_tuples_compared = 0
-
         # Lookup map: Key = indexed word pattern, value = encrypted word.
         pattern_key_to_enc_word_map = dict()
 
-        # For each encrypted word and its plaintext matches...
-        for index, (encrypted_word, plaintext_matches) in enumerate(encrypted_word_and_plaintext_matches.items()):
+        # The matched encrypted words with more than one plaintext match left, in the examined order. Key = indexed word
+        # pattern, value = encrypted word.
+        unresolved_words = dict()
+
+        # The encrypted letters of the matched encrypted words.
+        examined_letters = set()
+
+        # The plaintext letters each encrypted letter can still map to, given the deductions so far.
+        constraint_store = ConstraintStore()
+
+        # Key = unexamined encrypted word, value = the masks of its letters in the constraint store and its plaintext matches
+        # consistent with them (ADAPTIVE only).
+        consistent_plaintext_matches = dict()
+
+        # For each encrypted word and its plaintext matches, in the examine order...
+        while len(encrypted_word_and_plaintext_matches) > 0:
+            if budget is not None and self.__budget_exceeded(budget, stats):
+                break
+
+            begin_iteration = time.perf_counter()
+            iteration_pattern_cache_hits = StringPattern.cached.cache_info().hits
+
+            encrypted_word = self.__get_next_encrypted_word(encrypted_word_and_plaintext_matches, examine_word_order, constraint_store, consistent_plaintext_matches)
+            plaintext_matches = encrypted_word_and_plaintext_matches.pop(encrypted_word)
+            iteration = IterationStats(encrypted_word)
 
             # Growing list of encrypted words being examined.
             matched_encrypted_words.append(encrypted_word)
-            logger.info(f"\nExamining encrypted word: {encrypted_word}")
+            self.__logger.info("\nExamining encrypted word: %s", encrypted_word)
 
             # Create the indexed key.
-            encrypted_word_pattern = StringPattern(encrypted_word).get_pattern()
+            encrypted_word_pattern = StringPattern.cached(encrypted_word).get_pattern()
             encrypted_word_pattern_key = self.__string_to_indexed_pattern(len(matched_encrypted_words), encrypted_word)
             pattern_key_to_enc_word_map[encrypted_word_pattern_key] = encrypted_word
 
-            # Check if plaintext matches were pre-fetched or not.
-            if plaintext_matches is None:
-                plaintext_matches = self.__get_plaintext_matches_for_encrypted_word(encrypted_word)
+            iteration.plaintext_matches = self.__word_index.get_word_count(encrypted_word_pattern)
 
             # If the encrypted word has no matches, continue.
-            if plaintext_matches is None or len(plaintext_matches) == 0:
+            if iteration.plaintext_matches == 0:
                 matched_encrypted_words.remove(encrypted_word)
                 unmatched_encrypted_words.append(encrypted_word)
 
-                logger.info(f"No pattern matches. Removed: {encrypted_word}")
+                self.__logger.info("No pattern matches. Removed: %s", encrypted_word)
+                iteration.dropped = "no pattern matches"
+                hooks.on_word_examined(iteration)
+                self.__finish_iteration(stats, iteration, begin_iteration, iteration_pattern_cache_hits, hooks)
                 continue
 
-            # The cartesian product is created from a list of lists of matching words.
+            # Only look up the plaintext matches that have the plaintext letters already known at the same positions,
+            # rather than filtering every plaintext match of the pattern. ADAPTIVE has already narrowed them further.
+            if examine_word_order == ExamineOrder.ADAPTIVE:
+                _, plaintext_matches = consistent_plaintext_matches.pop(encrypted_word)
+            else:
+                plaintext_matches = self.__word_index.get_word_ids(encrypted_word_pattern, constraint_store.get_known_letters(encrypted_word))
+
+            # The cartesian product is created from a list of arrays of matching word IDs.
             deducted_plaintext_matches[encrypted_word_pattern_key] = plaintext_matches
 
             # At least two sets of matches are required to create a cartesian product.
             if not len(matched_encrypted_words) > 1:
-                continue
-
-            # New pattern for the encrypted words combined as a string.
-            combined_encrypted_words_pattern = StringPattern(''.join(matched_encrypted_words)).get_pattern()
-
-            logger.debug(f"\nBefore>deducted_plaintext_matches: {deducted_plaintext_matches}")
-            
-            logger.info(self.__bold_string("\nBefore deductions:"))
-            self.__log_deducted_plaintext_match_counts(deducted_plaintext_matches, pattern_key_to_enc_word_map)
-
-            # For each tuple of the cartesian product of the plaintext matches...
-            tuple_plaintext_matches = dict()
-            for plaintext_tuple in itertools.product(*deducted_plaintext_matches.values()):
-                total_tuples_compared += 1
-
-                # Create a combined pattern for the plaintext tuple.
-                combined_plaintext_tuple_pattern = StringPattern(''.join(itertools.chain(*plaintext_tuple))).get_pattern()
-
-                # Check if the patterns match.
-                if combined_encrypted_words_pattern == combined_plaintext_tuple_pattern:
-                    logger.info(f"\n{self.__bold_string('Tuple match:')} {' '.join(plaintext_tuple)}")
+                constraint_store.restrict([encrypted_word], [self.__word_index.get_letters(plaintext_matches, len(encrypted_word))])
+                examined_letters.update(encrypted_word)
+                if len(plaintext_matches) > 1:
+                    unresolved_words[encrypted_word_pattern_key] = encrypted_word
 
-                    for tuple_word_pos, tuple_word in enumerate(plaintext_tuple, start=1):
-                        tuple_word_key = self.__string_to_indexed_pattern(tuple_word_pos, tuple_word)
-
-                        # Initialise keyed list.
-                        if tuple_word_key not in tuple_plaintext_matches:
-                            tuple_plaintext_matches[tuple_word_key] = list()
+                hooks.on_word_examined(iteration)
+                self.__finish_iteration(stats, iteration, begin_iteration, iteration_pattern_cache_hits, hooks)
+                continue
 
-                        # Existing matches for the key.
-                        tuple_word_key_words = tuple_plaintext_matches[tuple_word_key]
+            # Only the unresolved words connected to the new word by shared encrypted letters are joined with it. A word
+            # resolved to one plaintext match is part of the fixed partial key in the constraint store, which the joined
+            # words are filtered by, so it can't narrow the join any further. A word that isn't connected can only narrow
+            # the new word's plaintext matches through the plaintext letters they both could take, which is checked
+            # between the components once the new word's component has been joined. The cost of each join depends on the
+            # words still unresolved, not on how many words have been examined.
+            unresolved_words[encrypted_word_pattern_key] = encrypted_word
+            unresolved_keys = list(unresolved_words)
+            components = [[unresolved_keys[word_pos] for word_pos in component] for component in self.__get_components(list(unresolved_words.values()))]
+            join_keys = next(component for component in components if encrypted_word_pattern_key in component)
+            join_words = [unresolved_words[key] for key in join_keys]
+
+            # Drop the plaintext matches that conflict with the letters deduced so far, before any tuples are joined. The
+            # constraint store may have been narrowed by other components since the other words were last joined, so
+            # their plaintext matches are filtered too.
+            plaintext_letters = self.__filter_plaintext_matches(join_keys, join_words, deducted_plaintext_matches, constraint_store)
+            plaintext_matches = deducted_plaintext_matches[encrypted_word_pattern_key]
+
+            iteration.consistent_matches = len(plaintext_matches)
+            iteration.component_words = len(join_keys)
+            iteration.matches_before = [len(deducted_plaintext_matches[key]) for key in join_keys]
+            hooks.on_word_examined(iteration)
+
+            if self.__logger.isEnabledFor(logging.DEBUG):
+                self.__logger.debug("\nBefore>deducted_plaintext_matches: %s", self.__deducted_plaintext_match_words(deducted_plaintext_matches, pattern_key_to_enc_word_map))
+
+            if self.__logger.isEnabledFor(logging.INFO):
+                self.__logger.info(self.__bold_string("\nBefore deductions:"))
+                self.__log_deducted_plaintext_match_counts(deducted_plaintext_matches, pattern_key_to_enc_word_map)
 
-                        # Don't add duplicate matches.
-                        if tuple_word not in tuple_word_key_words:
-                            tuple_word_key_words.append(tuple_word)
+            # Keep only the plaintext matches that are part of a tuple consistent with every joined word. There are no
+            # tuples if a word has no consistent plaintext matches left. A word joined on its own keeps them all.
+            tuple_plaintext_matches = list()
+            try:
+                if len(plaintext_matches) > 0 and len(join_keys) == 1:
+                    tuple_plaintext_matches = [np.arange(len(plaintext_matches))]
+                elif len(plaintext_matches) > 0:
+                    tuple_plaintext_matches, iteration.tuples_compared = self.__join(join_engine, join_words, plaintext_letters, budget)
+                    stats.total_tuples_compared += iteration.tuples_compared
+                    if budget is not None:
+                        budget.add_tuples(iteration.tuples_compared)
+
+                # The words of the other components must still have a tuple that doesn't take the plaintext letters of
+                # the new word's tuples.
+                if len(tuple_plaintext_matches) > 0 and len(components) > 1:
+                    join_keys, tuple_plaintext_matches, merge_tuples_compared = self.__merge_components(join_engine, components, join_keys, tuple_plaintext_matches,
+                                                                                                        unresolved_words, deducted_plaintext_matches, constraint_store, budget)
+                    iteration.tuples_compared += merge_tuples_compared
+                    stats.total_tuples_compared += merge_tuples_compared
+                    if budget is not None:
+                        budget.add_tuples(merge_tuples_compared)
+
+                    join_words = [unresolved_words[key] for key in join_keys]
+                    plaintext_letters = [self.__word_index.get_letters(deducted_plaintext_matches[key], len(unresolved_words[key])) for key in join_keys]
+                    iteration.matches_before = [len(deducted_plaintext_matches[key]) for key in join_keys]
+            except BudgetExceeded as exceeded:
+                # Leave the word unexamined. The deducted plaintext matches of the other words are from the last
+                # complete join.
+                deducted_plaintext_matches.pop(encrypted_word_pattern_key)
+                unresolved_words.pop(encrypted_word_pattern_key)
+                matched_encrypted_words.remove(encrypted_word)
+                encrypted_word_and_plaintext_matches[encrypted_word] = None
+                self.__truncate(stats, exceeded)
 
-                        # Latest matches.
-                        tuple_plaintext_matches[tuple_word_key] = tuple_word_key_words
+                iteration.dropped = f"budget exceeded ({exceeded.reason})"
+                self.__finish_iteration(stats, iteration, begin_iteration, iteration_pattern_cache_hits, hooks)
+                break
 
             if len(tuple_plaintext_matches) > 0:
-                # Overwrite to achieve the deduction.
-                deducted_plaintext_matches.update(tuple_plaintext_matches)
-
-                logger.debug(f"\nAfter>deducted_plaintext_matches: {deducted_plaintext_matches}")
-                
-                logger.info(self.__bold_string("\nAfter deductions:"))
-                self.__log_deducted_plaintext_match_counts(deducted_plaintext_matches, pattern_key_to_enc_word_map)
+                # Only the new word and the words whose plaintext matches were narrowed can narrow the constraints.
+                narrowed = [join_pos for join_pos, (key, positions) in enumerate(zip(join_keys, tuple_plaintext_matches))
+                            if len(positions) < len(deducted_plaintext_matches[key]) or key == encrypted_word_pattern_key]
+                constraint_store.restrict([join_words[join_pos] for join_pos in narrowed],
+                                          [plaintext_letters[join_pos][tuple_plaintext_matches[join_pos]] for join_pos in narrowed])
+
+                # Overwrite to achieve the deduction, and fold the words resolved to one plaintext match into the key.
+                for key, positions in zip(join_keys, tuple_plaintext_matches):
+                    deducted_plaintext_matches[key] = deducted_plaintext_matches[key][positions]
+                    if len(positions) == 1:
+                        unresolved_words.pop(key)
+
+                iteration.matches_after = [len(deducted_plaintext_matches[key]) for key in join_keys]
+                examined_letters.update(encrypted_word)
+
+                if self.__logger.isEnabledFor(logging.DEBUG):
+                    self.__logger.debug("\nAfter>deducted_plaintext_matches: %s", self.__deducted_plaintext_match_words(deducted_plaintext_matches, pattern_key_to_enc_word_map))
+
+                if self.__logger.isEnabledFor(logging.INFO):
+                    self.__logger.info(self.__bold_string("\nAfter deductions:"))
+                    self.__log_deducted_plaintext_match_counts(deducted_plaintext_matches, pattern_key_to_enc_word_map)
             else:
                 # Adding this encrypted word to the product resulted in no matches. This doesn't necessarily mean
                 # that this word is the problem. However, the best we can do at this stage is remove it and continue.
                 deducted_plaintext_matches.pop(encrypted_word_pattern_key)
+                unresolved_words.pop(encrypted_word_pattern_key)
                 matched_encrypted_words.remove(encrypted_word)
                 unmatched_encrypted_words.append(encrypted_word)
 
-                logger.info(self.__bold_string(f"\nNo tuple matches found for {encrypted_word}. Removed."))
+                iteration.dropped = "no tuple matches"
+                if self.__logger.isEnabledFor(logging.INFO):
+                    self.__logger.info(self.__bold_string(f"\nNo tuple matches found for {encrypted_word}. Removed."))
+
+            hooks.on_join(iteration)
 
             # Do we need to decrypt anymore words or do we have enough characters mapped to quit and build a cyphertext alphabet?
-            all_characters_examined = self.__unique_alpha_chars_in_string(''.join(matched_encrypted_words)) == unique_encrypted_characters
-            last_index = index == (len(encrypted_word_and_plaintext_matches) - 1)
+            all_characters_examined = len(examined_letters) == unique_encrypted_characters
+            last_index = len(encrypted_word_and_plaintext_matches) == 0
 
             break_early = False
             if all_characters_examined and not last_index:
-                logger.info("\nWe have examined all of the possible characters. Checking if we can break early...")
+                self.__logger.info("\nWe have examined all of the possible characters. Checking if we can break early...")
 
-                break_early = True
-                for matches in deducted_plaintext_matches:
-                    if not len(deducted_plaintext_matches[matches]) == 1:
-                        logger.info("\nNot breaking due to some words having more than one possible match.\n")
-                        break_early = False
-                        break
+                break_early = len(unresolved_words) == 0
+                if not break_early:
+                    self.__logger.info("\nNot breaking due to some words having more than one possible match.\n")
+
+            self.__finish_iteration(stats, iteration, begin_iteration, iteration_pattern_cache_hits, hooks)
 
             if break_early:
-                logger.info("\nBreaking early. We have all possible characters and one match for each currently examined word.\n")
+                self.__logger.info("\nBreaking early. We have all possible characters and one match for each currently examined word.\n")
+                stats.broke_early = True
                 break
 
-        # Get the plaintext and cyphertext alphabets.
-        alphabets_map = self.__build_alphabets_map(matched_encrypted_words, unmatched_encrypted_words, deducted_plaintext_matches)
+        # Get the plaintext and cyphertext alphabets. The letters of any words left unexamined are unknown.
+        stats.unexamined_words = list(encrypted_word_and_plaintext_matches) if stats.truncated else list()
+
+        stats.components = len(self.__get_components(matched_encrypted_words))
+
+        alphabets_map = self.__build_alphabets_map(matched_encrypted_words, unmatched_encrypted_words + stats.unexamined_words, deducted_plaintext_matches)
+
+        return self.__finish_deduction(alphabets_map, unmatched_encrypted_words, stats, begin_deduction, pattern_cache_hits, hooks)
 
+    def deduce_group_alphabet(self, encrypted_messages: list, examine_word_order: ExamineOrder, join_engine: JoinEngine = JoinEngine.VECTORIZED,
+                              hooks: DeductionHooks = None, budget: DeductionBudget = None, search_mode: SearchMode = SearchMode.EXHAUSTIVE,
+                              confirm_unique: bool = False) -> dict:
+        """
+        Deduces one alphabets map for a group of encrypted messages that are known to share a key. The normalised words
+        of the messages are merged, without duplicates, and deduced together, so the words of each message narrow the
+        plaintext matches of the others. The stats of the deduction are kept in last_stats.
+        """
+        return self.deduce_ciphertext_alphabet('\n'.join(encrypted_messages), examine_word_order, join_engine, hooks, budget, search_mode, confirm_unique)
+
+    def __finish_deduction(self, alphabets_map: dict, unmatched_encrypted_words: list, stats: DeductionStats, begin_deduction: float, pattern_cache_hits: int,
+                           hooks: DeductionHooks) -> dict:
         # Pad with all ascii alphabet characters.
         alphabets_map = self.__pad_alphabets_map(alphabets_map)
 
-        logger.info(f"\nTotal tuples examined: {total_tuples_compared}")
+        self.__logger.info("\nTotal tuples examined: %d", stats.total_tuples_compared)
+
+        # Cache the resolved letters of a new key.
+        if self.__key_cache is not None and not stats.cached_key and not stats.truncated:
+            resolved_letters = {enc_letter: plaintext_letters[0] for enc_letter, plaintext_letters in alphabets_map.items()
+                                if len(plaintext_letters) == 1 and plaintext_letters[0].isalpha()}
+            if len(resolved_letters) > 0:
+                self.__key_cache.put(resolved_letters)
+
+        stats.dropped_words = unmatched_encrypted_words
+        stats.seconds = time.perf_counter() - begin_deduction
+        stats.pattern_cache_hits = StringPattern.cached.cache_info().hits - pattern_cache_hits
+        self.last_stats = stats
+        hooks.on_finish(stats)
 
         return alphabets_map
 
+    def close(self) -> None:
+        """Shuts down the join workers, if they were started, and saves the key cache."""
+        if self.__join_executor is not None:
+            self.__join_executor.shutdown()
+            self.__join_executor = None
+
+        if self.__key_cache is not None:
+            self.__key_cache.save()
+
     def decrypt_message(self, encrypted_message: str, alphabets_map: dict) -> str:
         """Decrypts an encrypted string using the given alphabets_map."""
-        decrypted_message_list = list(encrypted_message)
-        for index, symbol in enumerate(encrypted_message):
+        return encrypted_message.translate(self.__get_translate_table(alphabets_map))
 
-            if symbol.upper() in alphabets_map:
-                replacement = alphabets_map[symbol.upper()]
-                if len(replacement) > 1:
-                    replacement = '[{0}]'.format(','.join(replacement))
-                else:
-                    replacement = replacement[0]
+    def decrypt_stream(self, input_stream: io.TextIOBase, output_stream: io.TextIOBase, examine_word_order: ExamineOrder, join_engine: JoinEngine = JoinEngine.VECTORIZED,
+                       sample_size: int = STREAM_SAMPLE_SIZE, max_sample_size: int = MAX_STREAM_SAMPLE_SIZE, chunk_size: int = STREAM_CHUNK_SIZE,
+                       budget: DeductionBudget = None, search_mode: SearchMode = SearchMode.EXHAUSTIVE, confirm_unique: bool = False) -> dict:
+        """
+        Decrypts a text stream of any size with constant memory use. The alphabets map is deduced from a leading sample
+        of the stream, which is doubled until every encrypted letter in it is resolved to one plaintext letter or it
+        reaches max_sample_size. The stream is then translated chunk by chunk and written to output_stream. Returns the
+        alphabets map. The budget applies to each deduction, and the sample isn't grown once a deduction is cut short.
+        """
+        sample = input_stream.read(sample_size)
+        end_of_input = len(sample) < sample_size
 
-                if symbol.isupper():
-                    replacement = replacement.upper()
-                else:
-                    replacement = replacement.lower()
+        while True:
+            # Only deduce from whole words, unless there's no more input to complete the last one.
+            sample_words = sample if end_of_input else self.__whole_words(sample)
+            alphabets_map = self.deduce_ciphertext_alphabet(sample_words, examine_word_order, join_engine, budget=budget, search_mode=search_mode,
+                                                            confirm_unique=confirm_unique)
+
+            if end_of_input or len(sample) >= max_sample_size or self.__all_letters_resolved(alphabets_map) or self.last_stats.truncated:
+                break
+
+            read_size = min(len(sample), max_sample_size - len(sample))
+            more_sample = input_stream.read(read_size)
+            end_of_input = len(more_sample) < read_size
+            sample += more_sample
+
+            self.__logger.info("\nLetters not resolved. Growing the sample to %d characters.", len(sample))
+
+        translate_table = self.__get_translate_table(alphabets_map)
+        output_stream.write(sample.translate(translate_table))
+        del sample
+
+        for chunk in iter(lambda: input_stream.read(chunk_size), ''):
+            output_stream.write(chunk.translate(translate_table))
 
-                decrypted_message_list[index] = replacement
+        return alphabets_map
+
+    @staticmethod
+    def __finish_iteration(stats: DeductionStats, iteration: IterationStats, begin_iteration: float, pattern_cache_hits: int, hooks: DeductionHooks) -> None:
+        iteration.seconds = time.perf_counter() - begin_iteration
+        iteration.pattern_cache_hits = StringPattern.cached.cache_info().hits - pattern_cache_hits
+        stats.iterations.append(iteration)
+        hooks.on_iteration(iteration)
+
+    def __find_most_likely_alphabets(self, encrypted_words: list, confirm_unique: bool, stats: DeductionStats, budget: DeductionBudget):
+        """
+        Returns the alphabets map of the most likely key consistent with every encrypted word that has plaintext
+        matches, and the encrypted words without any, or None if no key was found (or confirmed unique) in time.
+        """
+        plaintext_matches = self.__get_plaintext_matches_for_encrypted_words(encrypted_words)
+
+        # Drop the plaintext matches with digits, e.g. "120" for "GSV", which would map letters to digits.
+        for encrypted_word, word_ids in plaintext_matches.items():
+            letters = self.__word_index.get_letters(word_ids, len(encrypted_word))
+            plaintext_matches[encrypted_word] = word_ids[~np.any((letters >= ord('0')) & (letters <= ord('9')), axis=1)]
+
+        matched_encrypted_words = [encrypted_word for encrypted_word in encrypted_words if len(plaintext_matches[encrypted_word]) > 0]
+        unmatched_encrypted_words = [encrypted_word for encrypted_word in encrypted_words if len(plaintext_matches[encrypted_word]) == 0]
+        if len(matched_encrypted_words) == 0:
+            return None
+
+        plaintext_letters = [self.__word_index.get_letters(plaintext_matches[encrypted_word], len(encrypted_word)) for encrypted_word in matched_encrypted_words]
+        plaintext_weights = [self.__word_index.get_weights(plaintext_matches[encrypted_word]) for encrypted_word in matched_encrypted_words]
+
+        try:
+            matching_tuples, candidates_examined, complete = join.most_likely_join(matched_encrypted_words, plaintext_letters, plaintext_weights, 2 if confirm_unique else 1,
+                                                                                   MOST_LIKELY_MAX_CANDIDATES, budget)
+        except BudgetExceeded:
+            # The exhaustive deduction stops at its first check of the budget.
+            return None
+
+        stats.total_tuples_compared += candidates_examined
+        if budget is not None:
+            budget.add_tuples(candidates_examined)
+
+        if len(matching_tuples) == 0 or (confirm_unique and not (len(matching_tuples) == 1 and complete)):
+            return None
+
+        if self.__logger.isEnabledFor(logging.INFO):
+            self.__logger.info("\n%s %s", self.__bold_string("Most likely tuple:"),
+                        ' '.join(self.__word_index.get_words(plaintext_matches[encrypted_word][[match_pos]], len(encrypted_word))[0]
+                                 for encrypted_word, match_pos in zip(matched_encrypted_words, matching_tuples[0])))
+
+        deducted_plaintext_matches = {self.__string_to_indexed_pattern(index, encrypted_word): plaintext_matches[encrypted_word][[match_pos]]
+                                      for index, (encrypted_word, match_pos) in enumerate(zip(matched_encrypted_words, matching_tuples[0]), start=1)}
+        stats.most_likely_key = True
+
+        return self.__build_alphabets_map(matched_encrypted_words, unmatched_encrypted_words, deducted_plaintext_matches), unmatched_encrypted_words
+
+    @staticmethod
+    def __get_components(encrypted_words: list) -> list:
+        """
+        Returns the positions of the encrypted words grouped into connected components, where two words are connected if
+        they share an encrypted letter, directly or through other words. Each component's positions are in order.
+        """
+        # Union-find over the encrypted letters, merging the letters of each word into one set.
+        letter_parents = dict()
+
+        def find(letter: str) -> str:
+            while letter_parents.setdefault(letter, letter) != letter:
+                letter_parents[letter] = letter_parents[letter_parents[letter]]
+                letter = letter_parents[letter]
+            return letter
+
+        for encrypted_word in encrypted_words:
+            root = find(encrypted_word[0])
+            for encrypted_letter in encrypted_word[1:]:
+                letter_parents[find(encrypted_letter)] = root
+
+        components = dict()
+        for word_pos, encrypted_word in enumerate(encrypted_words):
+            components.setdefault(find(encrypted_word[0]), list()).append(word_pos)
+
+        return list(components.values())
+
+    def __filter_plaintext_matches(self, keys: list, encrypted_words: list, deducted_plaintext_matches: dict, constraint_store: ConstraintStore) -> list:
+        """
+        Drops the deducted plaintext matches of the given words that are inconsistent with the constraint store, and
+        returns the plaintext letters of those left.
+        """
+        plaintext_letters = list()
+        for key, encrypted_word in zip(keys, encrypted_words):
+            letters = self.__word_index.get_letters(deducted_plaintext_matches[key], len(encrypted_word))
+            consistent = constraint_store.filter(encrypted_word, letters)
+            deducted_plaintext_matches[key] = deducted_plaintext_matches[key][consistent]
+            plaintext_letters.append(letters[consistent])
+
+        return plaintext_letters
+
+    def __merge_components(self, join_engine: JoinEngine, components: list, join_keys: list, tuple_plaintext_matches: list, unresolved_words: dict,
+                           deducted_plaintext_matches: dict, constraint_store: ConstraintStore, budget: DeductionBudget) -> tuple:
+        """
+        Joins the just joined component of unresolved words again with the other components whose plaintext matches
+        could take the same plaintext letters, directly or through each other, as each plaintext letter is encrypted by
+        only one letter. The other components can't conflict with them, so are left as they are. Returns the keys of
+        the joined words, the positions of their plaintext matches that are part of a tuple consistent with all of them
+        (or an empty list if there are none) and the number of tuples compared.
+        """
+        joined_plaintext_matches = {key: deducted_plaintext_matches[key][positions] for key, positions in zip(join_keys, tuple_plaintext_matches)}
+
+        def get_plaintext_letter_set(plaintext_letters: list) -> set:
+            return set(np.unique(np.concatenate([letters.ravel() for letters in plaintext_letters])).tolist())
+
+        merged_keys = list(join_keys)
+        merged_letters = get_plaintext_letter_set([self.__word_index.get_letters(joined_plaintext_matches[key], len(unresolved_words[key])) for key in join_keys])
+
+        other_components = list()
+        for component in components:
+            if component[0] not in joined_plaintext_matches:
+                plaintext_letters = self.__filter_plaintext_matches(component, [unresolved_words[key] for key in component], deducted_plaintext_matches, constraint_store)
+                other_components.append((component, get_plaintext_letter_set(plaintext_letters)))
+
+        merging = True
+        while merging:
+            merging = False
+            for component, component_letters in list(other_components):
+                if not merged_letters.isdisjoint(component_letters):
+                    merged_keys.extend(component)
+                    merged_letters.update(component_letters)
+                    other_components.remove((component, component_letters))
+                    merging = True
+
+        if len(merged_keys) == len(join_keys):
+            return join_keys, tuple_plaintext_matches, 0
+
+        merged_words = [unresolved_words[key] for key in merged_keys]
+        plaintext_letters = [self.__word_index.get_letters(joined_plaintext_matches.get(key, deducted_plaintext_matches[key]), len(unresolved_words[key])) for key in merged_keys]
+        merged_positions, tuples_compared = self.__join(join_engine, merged_words, plaintext_letters, budget)
+        if len(merged_positions) == 0:
+            return merged_keys, list(), tuples_compared
+
+        # The positions of the just joined words are of the plaintext matches left by their own join.
+        return merged_keys, [tuple_plaintext_matches[join_pos][positions] if join_pos < len(join_keys) else positions
+                             for join_pos, positions in enumerate(merged_positions)], tuples_compared
+
+    def __find_cached_alphabets(self, encrypted_words: list, stats: DeductionStats):
+        """
+        Returns the alphabets map of the most recently used cached key under which at least KEY_CACHE_MIN_SCORE of the
+        encrypted words with plaintext matches decrypt to dictionary words, and the encrypted words without any
+        plaintext matches, or None if no cached key scores that well.
+        """
+        word_counts = {encrypted_word: self.__word_index.get_word_count(StringPattern.cached(encrypted_word).get_pattern()) for encrypted_word in encrypted_words}
+        matched_encrypted_words = [encrypted_word for encrypted_word in encrypted_words if word_counts[encrypted_word] > 0]
+        unmatched_encrypted_words = [encrypted_word for encrypted_word in encrypted_words if word_counts[encrypted_word] == 0]
+        if len(matched_encrypted_words) == 0:
+            return None
+
+        # Round away the floating point error of 1 - KEY_CACHE_MIN_SCORE, so that a score of exactly KEY_CACHE_MIN_SCORE is enough.
+        max_misses = math.floor(round((1 - KEY_CACHE_MIN_SCORE) * len(matched_encrypted_words), 9))
+        for key in self.__key_cache.get_keys():
+            misses = 0
+            for encrypted_word in matched_encrypted_words:
+                if not self.__decrypts_to_dictionary_word(encrypted_word, key):
+                    misses += 1
+                    if misses > max_misses:
+                        break
+            else:
+                self.__key_cache.touch(key)
+                self.__logger.info("\nUsing a cached key. %d of %d words decrypt to dictionary words.", len(matched_encrypted_words) - misses,
+                                   len(matched_encrypted_words))
+                stats.cached_key = True
+
+                UNKNOWN_CHAR = '?'
+                alphabets_map = {enc_letter: [key.get(enc_letter, UNKNOWN_CHAR)] for enc_letter in ''.join(encrypted_words)}
+                return alphabets_map, unmatched_encrypted_words
 
-        decrypted_message = ''.join(decrypted_message_list)
+        return None
 
-        return decrypted_message
+    def __decrypts_to_dictionary_word(self, encrypted_word: str, key: dict) -> bool:
+        """Returns True if every letter of the encrypted word is in the key, and the word decrypts to a dictionary word."""
+        known_letters = dict()
+        for enc_letter in dict.fromkeys(encrypted_word):
+            if enc_letter not in key:
+                return False
+
+            known_letters[encrypted_word.index(enc_letter)] = ord(key[enc_letter])
+
+        return len(self.__word_index.get_word_ids(StringPattern.cached(encrypted_word).get_pattern(), known_letters)) > 0
+
+    def __budget_exceeded(self, budget: DeductionBudget, stats: DeductionStats) -> bool:
+        try:
+            budget.check()
+        except BudgetExceeded as exceeded:
+            self.__truncate(stats, exceeded)
+            return True
+
+        return False
+
+    def __truncate(self, stats: DeductionStats, exceeded: BudgetExceeded) -> None:
+        self.__logger.info("\nBudget exceeded (%s). Building the alphabets from the words examined so far.", exceeded.reason)
+        stats.truncated = True
+        stats.truncated_reason = exceeded.reason
+
+    def __join(self, join_engine: JoinEngine, encrypted_words: list, plaintext_letters: list, budget: DeductionBudget) -> tuple:
+        """Joins the plaintext matches with the join engine, sharding large products across the join workers."""
+        join_plaintext_matches = self.__JOINS[join_engine]
+
+        if self.__join_workers > 1 and math.prod(len(letters) for letters in plaintext_letters) >= PARALLEL_JOIN_MIN_TUPLES:
+            if self.__join_executor is None:
+                self.__join_executor = ProcessPoolExecutor(max_workers=self.__join_workers)
+
+            return join.sharded_join(join_plaintext_matches, encrypted_words, plaintext_letters, self.__join_executor,
+                                     self.__join_workers * PARALLEL_JOIN_SHARDS_PER_WORKER, budget, self.__logger)
+
+        return join_plaintext_matches(encrypted_words, plaintext_letters, budget, self.__logger)
 
     def __string_to_indexed_pattern(self, index: int, encrypted_word: str) -> str:
         """
         Creates an indexed word pattern - rather than just the word pattern. This is to ensure that
         different words with the same pattern e.g. 'good' and 'food' will have their own entry in the map.
         """
-        return str(index) + '-' + StringPattern(encrypted_word).get_pattern()
+        return str(index) + '-' + StringPattern.cached(encrypted_word).get_pattern()
 
-    def __get_plaintext_matches_for_encrypted_word(self, encrypted_word: str) -> list:
-        encrypted_word_pattern = StringPattern(encrypted_word).get_pattern()
-        if encrypted_word_pattern in wordpatterns.patterns:
-            return wordpatterns.patterns[encrypted_word_pattern]
-
-        return list()
+    def __get_plaintext_matches_for_encrypted_word(self, encrypted_word: str) -> np.ndarray:
+        """Returns an array of the word IDs of the plaintext matches"""
+        encrypted_word_pattern = StringPattern.cached(encrypted_word).get_pattern()
+        return self.__word_index.get_word_ids(encrypted_word_pattern)
 
     def __get_plaintext_matches_for_encrypted_words(self, encrypted_words: list) -> dict:
-        """Returns a dict of encrypted words and a list of plaintest matches"""
+        """Returns a dict of encrypted words and an array of the word IDs of the plaintest matches"""
         encrypted_words_and_plaintext_matches = dict()
 
         for encrypted_word in encrypted_words:
             if encrypted_word not in encrypted_words_and_plaintext_matches:
-                encrypted_word_pattern = StringPattern(encrypted_word).get_pattern()
-                if encrypted_word_pattern in wordpatterns.patterns:
-                    encrypted_words_and_plaintext_matches[encrypted_word] = wordpatterns.patterns[encrypted_word_pattern]
-                else:
-                    encrypted_words_and_plaintext_matches[encrypted_word] = list()
+                encrypted_words_and_plaintext_matches[encrypted_word] = self.__get_plaintext_matches_for_encrypted_word(encrypted_word)
 
         return encrypted_words_and_plaintext_matches
 
     def __get_ordered_encrypted_word_and_plaintext_matches(self, encrypted_words: list, examine_word_order: ExamineOrder) -> dict:
         """Returns an OrderedDict of encrypted words and a list of plaintest matches"""
+        if examine_word_order == ExamineOrder.ADAPTIVE:
+            # Pre-fetch matches. The next word is chosen after each deduction.
+            return OrderedDict(self.__get_plaintext_matches_for_encrypted_words(encrypted_words))
+
         if examine_word_order == ExamineOrder.FEWEST_TO_MOST_MATCHES or examine_word_order == ExamineOrder.MATCHES_DIVIDED_BY_LENGTH:
             # Pre-fetch matches and re-order by number of fewest to most number of matches.
             encrypted_word_and_plaintext_matches = self.__get_plaintext_matches_for_encrypted_words(encrypted_words)
@@ -243,6 +699,65 @@ class SscDecryptor:
             sorted_encrypted_words = sorted(encrypted_words, key=lambda enc_word: len(enc_word), reverse=True)
             return OrderedDict([(key, None) for key in sorted_encrypted_words])
 
+    @staticmethod
+    def __get_translate_table(alphabets_map: dict) -> dict:
+        """
+        Returns a str.translate table for the alphabets_map. Letters with more than one possible plaintext match are
+        replaced with all of them e.g. '[A,B]', and the case of each encrypted letter is kept.
+        """
+        translate_table = dict()
+
+        # Every symbol whose uppercase form is an alphabets map key: the ascii letters, plus the dotless i and long s.
+        for symbol in string.ascii_letters + '\u0131\u017f':
+            if symbol.upper() in alphabets_map:
+                replacement = alphabets_map[symbol.upper()]
+                if len(replacement) > 1:
+                    replacement = '[{0}]'.format(','.join(replacement))
+                else:
+                    replacement = replacement[0]
+
+                translate_table[ord(symbol)] = replacement.upper() if symbol.isupper() else replacement.lower()
+
+        return translate_table
+
+    @staticmethod
+    def __whole_words(text: str) -> str:
+        """Returns the text up to and including its last whitespace, or all of it if there's no whitespace."""
+        match = re.match(r'.*\s', text, re.DOTALL)
+        return match.group() if match is not None else text
+
+    @staticmethod
+    def __all_letters_resolved(alphabets_map: dict) -> bool:
+        """Returns True if every letter of the alphabets map has exactly one known plaintext letter (or is padding)."""
+        return all(len(plaintext_letters) == 1 and plaintext_letters != ['?'] for plaintext_letters in alphabets_map.values())
+
+    def __get_next_encrypted_word(self, encrypted_word_and_plaintext_matches: dict, examine_word_order: ExamineOrder, constraint_store: ConstraintStore,
+                                  consistent_plaintext_matches: dict) -> str:
+        """
+        Returns the next encrypted word to examine. This is the first word of a static order. ADAPTIVE returns the word
+        with the smallest expected product size: the number of its plaintext matches that are consistent with the
+        constraint store, divided by the number of new encrypted letters it would add. The constraints only ever narrow,
+        so the consistent plaintext matches of each word are kept in consistent_plaintext_matches with the masks of its
+        letters, and only narrowed further once the constraint store has changed one of those masks.
+        """
+        if examine_word_order != ExamineOrder.ADAPTIVE:
+            return next(iter(encrypted_word_and_plaintext_matches))
+
+        def expected_product_size(encrypted_word: str) -> tuple:
+            masks = constraint_store.get_masks(encrypted_word)
+            filtered_masks, word_ids = consistent_plaintext_matches.get(encrypted_word, (None, encrypted_word_and_plaintext_matches[encrypted_word]))
+            if masks != filtered_masks:
+                plaintext_letters = self.__word_index.get_letters(word_ids, len(encrypted_word))
+                word_ids = word_ids[constraint_store.filter(encrypted_word, plaintext_letters)]
+                consistent_plaintext_matches[encrypted_word] = masks, word_ids
+
+            # A word that maps many new encrypted letters for few consistent matches is worth more than a word that is
+            # only cheap because it adds little.
+            new_letters = sum(1 for encrypted_letter in set(encrypted_word) if not constraint_store.is_constrained(encrypted_letter))
+            return len(word_ids) / (1 + new_letters), -len(encrypted_word)
+
+        return min(encrypted_word_and_plaintext_matches, key=expected_product_size)
+
     @staticmethod
     def __unique_alpha_chars_in_string(string: str) -> int:
         return sum(map(str.isalpha, set(''.join(string.split()))))
@@ -279,7 +794,7 @@ class SscDecryptor:
         for index, encrypted_word in enumerate(matched_encrypted_words, start=1):
             encrypted_word_indexed_key = self.__string_to_indexed_pattern(index, encrypted_word)
 
-            plaintext_matches = deducted_plaintext_matches[encrypted_word_indexed_key]
+            plaintext_matches = self.__word_index.get_words(deducted_plaintext_matches[encrypted_word_indexed_key], len(encrypted_word))
 
             for plaintext_match in plaintext_matches:
                 for (plaintext_letter, enc_letter) in zip(plaintext_match, encrypted_word):
@@ -312,7 +827,11 @@ class SscDecryptor:
         for deducted_plaintext_match in deducted_plaintext_matches:
             encrypted_word = pattern_key_to_enc_word_map[deducted_plaintext_match]
             len_matches = len(deducted_plaintext_matches[deducted_plaintext_match])
-            logger.info(f"{self.__bold_string(encrypted_word.ljust(left_just))} has {self.__bold_string(len_matches)} possible matches")
+            self.__logger.info(f"{self.__bold_string(encrypted_word.ljust(left_just))} has {self.__bold_string(len_matches)} possible matches")
+
+    def __deducted_plaintext_match_words(self, deducted_plaintext_matches: dict, pattern_key_to_enc_word_map: dict) -> dict:
+        """Returns the deducted plaintext matches as words rather than word IDs, for logging."""
+        return {key: self.__word_index.get_words(word_ids, len(pattern_key_to_enc_word_map[key])) for key, word_ids in deducted_plaintext_matches.items()}
 
     @staticmethod
     def __pad_alphabets_map(alphabets_map: dict) -> dict:
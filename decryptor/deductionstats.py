@@ -0,0 +1,84 @@
+from dataclasses import asdict, dataclass, field
+
+@dataclass
+class IterationStats:
+    """Stats of one iteration of deduce_ciphertext_alphabet, which examines one encrypted word."""
+    encrypted_word: str
+
+    # Number of plaintext matches of the word's pattern, and how many of them were consistent with the letters deduced
+    # so far (None if the word wasn't joined).
+    plaintext_matches: int = 0
+    consistent_matches: int = None
+
+    # Number of plaintext matches of each joined word before and after the join. Empty if there was no join.
+    matches_before: list = field(default_factory=list)
+    matches_after: list = field(default_factory=list)
+
+    tuples_compared: int = 0
+    seconds: float = 0.0
+
+    # Number of examined words connected to the word by shared letters, which were joined (0 if there was no join).
+    component_words: int = 0
+
+    # Why the word was dropped from the examined words, or None if it wasn't.
+    dropped: str = None
+
+    # Number of word pattern cache hits during the iteration.
+    pattern_cache_hits: int = 0
+
+
+@dataclass
+class DeductionStats:
+    """Stats of one call to deduce_ciphertext_alphabet."""
+    examine_order: str
+    join_engine: str
+    search_mode: str = "EXHAUSTIVE"
+    encrypted_words: int = 0
+    unique_letters: int = 0
+    iterations: list = field(default_factory=list)
+    total_tuples_compared: int = 0
+    seconds: float = 0.0
+    dropped_words: list = field(default_factory=list)
+    broke_early: bool = False
+    pattern_cache_hits: int = 0
+
+    # Number of connected components of the matched words, which are joined separately. Words are connected if they
+    # share an encrypted letter.
+    components: int = 0
+
+    # Whether the deduction was cut short by its budget, why (e.g. "deadline" or "cancelled"), and the words it didn't
+    # get to examine.
+    truncated: bool = False
+    truncated_reason: str = None
+    unexamined_words: list = field(default_factory=list)
+
+    # Whether the alphabets map is the key found by the MOST_LIKELY_FIRST search, without the exhaustive deduction.
+    most_likely_key: bool = False
+
+    # Whether the alphabets map is a key from the key cache, without a deduction.
+    cached_key: bool = False
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class DeductionHooks:
+    """
+    Callbacks for each stage of deduce_ciphertext_alphabet, e.g. to send metrics to a dashboard. Override the stages
+    that are needed; the default callbacks do nothing. The stats objects are still being filled in until on_finish.
+    """
+
+    def on_start(self, stats: DeductionStats) -> None:
+        """Called once the encrypted words have been normalised, before any are examined."""
+
+    def on_word_examined(self, iteration: IterationStats) -> None:
+        """Called when an encrypted word's plaintext matches have been found, before they are joined."""
+
+    def on_join(self, iteration: IterationStats) -> None:
+        """Called after the plaintext matches of the examined words have been joined."""
+
+    def on_iteration(self, iteration: IterationStats) -> None:
+        """Called at the end of each iteration, including when the word was dropped."""
+
+    def on_finish(self, stats: DeductionStats) -> None:
+        """Called once the alphabets map has been built."""
@@ -4,4 +4,4 @@ class ExamineOrder(Enum):
     LONGEST_TO_SHORTEST = auto()
     FEWEST_TO_MOST_MATCHES = auto()
     MATCHES_DIVIDED_BY_LENGTH = auto()
-    
\ No newline at end of file
+    ADAPTIVE = auto()
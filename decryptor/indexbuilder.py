@@ -0,0 +1,140 @@
+import codecs
+import hashlib
+import logging
+import os
+import string
+from concurrent.futures import ProcessPoolExecutor
+
+from decryptor.stringpattern import StringPattern
+from decryptor.wordindex import WordIndex
+
+logger = logging.getLogger("decryptor")
+
+# Changing how words files are loaded or indexed must change this, so that existing segments are rebuilt.
+SEGMENT_VERSION = 3
+
+# Maximum number of segments kept in the segments directory. The least recently used are removed first.
+MAX_SEGMENTS = 16
+
+# Number of words whose patterns are calculated by each task of the process pool.
+PATTERN_CHUNK_SIZE = 20000
+
+def build_word_index(words_files: list, index_file: str, workers: int = None, frequency_file: str = None) -> WordIndex:
+    """
+    Returns the word index for the given words files. Each words file is indexed as a separate segment, identified by
+    the hash of the file's content, and the segments are merged into the index file. Only the segments of words files
+    that are new or have changed are built, and the index file is only merged again if its segments or its frequency
+    file have changed. The words are weighted by the frequency file, if one is given.
+    """
+    segments_dir = os.path.splitext(index_file)[0] + '.segments'
+    segment_hashes = [_words_file_hash(words_file) for words_file in words_files]
+    frequency_hash = _words_file_hash(frequency_file) if frequency_file is not None else None
+
+    if os.path.exists(index_file):
+        try:
+            word_index = WordIndex(index_file)
+        except ValueError:
+            # An index file written in an older format is rebuilt.
+            word_index = None
+
+        if word_index is not None and word_index.get_metadata().get('segments') == segment_hashes and word_index.get_metadata().get('frequencies') == frequency_hash:
+            return word_index
+
+    os.makedirs(segments_dir, exist_ok=True)
+
+    segments = list()
+    for words_file, segment_hash in zip(words_files, segment_hashes):
+        segment_file = os.path.join(segments_dir, f"{segment_hash}.idx")
+
+        if not os.path.exists(segment_file):
+            logger.info("Indexing words file: %s", words_file)
+            _build_segment(words_file, segment_file, workers)
+
+        # Mark the segment as recently used.
+        os.utime(segment_file)
+        segments.append(WordIndex(segment_file))
+
+    weights = load_word_frequencies(frequency_file) if frequency_file is not None else None
+    _merge_segments(segments, index_file, {'words_files': words_files, 'segments': segment_hashes, 'frequency_file': frequency_file, 'frequencies': frequency_hash}, weights)
+    _remove_unused_segments(segments_dir, MAX_SEGMENTS)
+
+    return WordIndex(index_file)
+
+
+def load_plaintext_words(words_file: str) -> list:
+    """Returns the unique, uppercase words of a words file with punctuation removed."""
+    with codecs.open(words_file, 'r', encoding='utf-8', errors="ignore") as words:
+        return list(dict.fromkeys(word.rstrip().translate(str.maketrans('', '', string.punctuation)).upper() for word in words))
+
+
+def load_word_frequencies(frequency_file: str) -> dict:
+    """
+    Returns a dict of the uppercase words (keys) of a frequency file and their weights (values). Each line is a word,
+    optionally followed by its count. Words without a count are weighted by their rank, so the first word of the file
+    is the most frequent. Only the first line of a word is used.
+    """
+    with codecs.open(frequency_file, 'r', encoding='utf-8', errors="ignore") as frequencies:
+        lines = [line.split() for line in frequencies if len(line.strip()) > 0]
+
+    weights = dict()
+    for rank, fields in enumerate(lines):
+        word = fields[0].translate(str.maketrans('', '', string.punctuation)).upper()
+        weights.setdefault(word, float(fields[1]) if len(fields) > 1 else float(len(lines) - rank))
+
+    return weights
+
+
+def _build_segment(words_file: str, segment_file: str, workers: int) -> None:
+    """Generate patterns for all words of a words file, spread across a process pool, and writes them as a segment."""
+    words = load_plaintext_words(words_file)
+    word_chunks = [words[start:start + PATTERN_CHUNK_SIZE] for start in range(0, len(words), PATTERN_CHUNK_SIZE)]
+
+    if workers == 1 or len(word_chunks) <= 1:
+        word_patterns = [_get_patterns(word_chunk) for word_chunk in word_chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            word_patterns = list(executor.map(_get_patterns, word_chunks))
+
+    patterns = dict()
+    for word_chunk, pattern_chunk in zip(word_chunks, word_patterns):
+        for word, pattern in zip(word_chunk, pattern_chunk):
+            patterns.setdefault(pattern, list()).append(word)
+
+    WordIndex.write(segment_file, patterns, {'words_file': words_file})
+
+
+def _get_patterns(words: list) -> list:
+    return [StringPattern.cached(word).get_pattern() for word in words]
+
+
+def _merge_segments(segments: list, index_file: str, metadata: dict, weights: dict = None) -> None:
+    """
+    Merges the patterns of the segments into one index file, with the given word weights. Words keep the order of the
+    segments, and a word that appears in more than one segment is only kept the first time.
+    """
+    patterns = dict()
+    for segment in segments:
+        for pattern, words in segment.get_pattern_words():
+            patterns.setdefault(pattern, list()).extend(words)
+
+    if len(segments) > 1:
+        patterns = {pattern: list(dict.fromkeys(words)) for pattern, words in patterns.items()}
+
+    WordIndex.write(index_file, patterns, metadata, weights)
+
+
+def _remove_unused_segments(segments_dir: str, max_segments: int) -> None:
+    segment_files = [os.path.join(segments_dir, segment_file) for segment_file in os.listdir(segments_dir) if segment_file.endswith('.idx')]
+    segment_files.sort(key=os.path.getmtime, reverse=True)
+
+    for segment_file in segment_files[max_segments:]:
+        os.remove(segment_file)
+
+
+def _words_file_hash(words_file: str) -> str:
+    words_file_hash = hashlib.sha256(f"{SEGMENT_VERSION}\n".encode('ascii'))
+    with open(words_file, 'rb') as words:
+        for block in iter(lambda: words.read(1 << 20), b''):
+            words_file_hash.update(block)
+
+    return words_file_hash.hexdigest()
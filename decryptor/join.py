@@ -0,0 +1,456 @@
+import concurrent.futures
+import itertools
+import logging
+
+import numpy as np
+
+from decryptor.budget import DeductionBudget
+from decryptor.stringpattern import StringPattern
+from decryptor.wordindex import WordIndex
+
+logger = logging.getLogger("decryptor")
+
+# Maximum number of (partial tuple, plaintext match) pairs that vectorized_join compares in one batch.
+VECTORIZED_JOIN_BATCH_SIZE = 1 << 20
+
+# Maximum number of partial tuples that vectorized_join holds before falling back to backtracking_join.
+VECTORIZED_JOIN_MAX_TUPLES = 1 << 20
+
+# Maximum number of shared letters encoded in a vectorized_join key. Any further shared letters are compared directly.
+_JOIN_KEY_LETTERS = 10
+
+# Number of tuples that product_join and backtracking_join compare between checks of the budget.
+BUDGET_CHECK_INTERVAL = 1 << 14
+
+# Seconds between checks of the budget while sharded_join waits for its shards.
+BUDGET_POLL_SECONDS = 0.1
+
+def product_join(encrypted_words: list, plaintext_letters: list, budget: DeductionBudget = None, logger: logging.Logger = logger) -> tuple:
+    """
+    Compares the combined pattern of the encrypted words with the combined pattern of every tuple in the cartesian
+    product of the plaintext matches, given as (matches, word length) arrays of code points. Returns, for each word,
+    the sorted positions of the plaintext matches that are part of at least one matching tuple, or an empty list if no
+    tuple matched, and the number of tuples compared. Raises BudgetExceeded if the budget runs out during the join.
+    """
+    plaintext_matches = [WordIndex.letters_to_words(letters) for letters in plaintext_letters]
+
+    # New pattern code for the encrypted words combined as a string.
+    combined_encrypted_words_code = StringPattern.string_to_code(''.join(encrypted_words))
+
+    # Matched words for each position of the tuple.
+    tuple_plaintext_matches = [set() for _ in plaintext_matches]
+    tuples_compared = 0
+    log_tuple_matches = logger.isEnabledFor(logging.INFO)
+
+    # For each tuple of the cartesian product of the plaintext matches...
+    for plaintext_tuple in itertools.product(*plaintext_matches):
+        tuples_compared += 1
+        if budget is not None and tuples_compared % BUDGET_CHECK_INTERVAL == 0:
+            budget.check(tuples_compared)
+
+        # Create a combined pattern code for the plaintext tuple. Codes are equal exactly when patterns are equal.
+        combined_plaintext_tuple_code = StringPattern.string_to_code(''.join(plaintext_tuple))
+
+        # Check if the patterns match.
+        if combined_encrypted_words_code == combined_plaintext_tuple_code:
+            if log_tuple_matches:
+                logger.info("\n%s %s", _bold_string('Tuple match:'), ' '.join(plaintext_tuple))
+
+            for tuple_word_pos, tuple_word in enumerate(plaintext_tuple):
+                tuple_plaintext_matches[tuple_word_pos].add(tuple_word)
+
+    return _filter_plaintext_matches(plaintext_matches, tuple_plaintext_matches), tuples_compared
+
+
+def backtracking_join(encrypted_words: list, plaintext_letters: list, budget: DeductionBudget = None, logger: logging.Logger = logger) -> tuple:
+    """
+    Extends a partial cyphertext to plaintext letter mapping one encrypted word at a time, abandoning a branch as soon
+    as a plaintext match conflicts with the mapping built so far. Returns the same plaintext matches as product_join,
+    and the number of plaintext matches examined.
+    """
+    plaintext_matches = [WordIndex.letters_to_words(letters) for letters in plaintext_letters]
+
+    # Only the first occurrence of each encrypted letter needs checking, as each plaintext match already shares the
+    # word pattern of its encrypted word.
+    letter_positions = [_first_letter_positions(encrypted_word) for encrypted_word in encrypted_words]
+
+    # Search the words with the fewest plaintext matches first, so conflicts are found near the root.
+    search_order = sorted(range(len(encrypted_words)), key=lambda word_pos: len(plaintext_matches[word_pos]))
+
+    # By the time a word is searched, the letters it shares with the words searched before it are already mapped. Its
+    # plaintext matches are grouped by the plaintext letters at those shared positions, so only the group agreeing with
+    # the mapping is examined.
+    shared_letters = list()
+    match_groups = list()
+    searched_letters = set()
+    for word_pos in search_order:
+        word_shared_letters = [(enc_letter, letter_pos) for enc_letter, letter_pos in letter_positions[word_pos] if enc_letter in searched_letters]
+        searched_letters.update(encrypted_words[word_pos])
+
+        groups = dict()
+        for plaintext_match in plaintext_matches[word_pos]:
+            groups.setdefault(tuple(plaintext_match[letter_pos] for _, letter_pos in word_shared_letters), list()).append(plaintext_match)
+
+        shared_letters.append([enc_letter for enc_letter, _ in word_shared_letters])
+        match_groups.append(groups)
+
+    tuple_plaintext_matches = [set() for _ in plaintext_matches]
+    cypher_to_plain = dict()
+    plain_to_cypher = dict()
+    chosen_words = [None] * len(encrypted_words)
+    candidates_examined = 0
+
+    # The search is iterative rather than recursive, as long messages can have more words than the recursion limit.
+    # Each depth keeps an iterator over its plaintext matches and the letters its current match added to the mapping.
+    match_iterators = [iter(match_groups[0].get((), list()))]
+    added_letters = [list()]
+    depth = 0
+    log_tuple_matches = logger.isEnabledFor(logging.INFO)
+    while depth >= 0:
+        # Undo the previous match's additions at this depth before trying the next one.
+        for enc_letter in added_letters[depth]:
+            del plain_to_cypher[cypher_to_plain.pop(enc_letter)]
+        added_letters[depth].clear()
+
+        word_pos = search_order[depth]
+        for plaintext_match in match_iterators[depth]:
+            candidates_examined += 1
+            if budget is not None and candidates_examined % BUDGET_CHECK_INTERVAL == 0:
+                budget.check(candidates_examined)
+
+            if _extend_mapping(plaintext_match, letter_positions[word_pos], cypher_to_plain, plain_to_cypher, added_letters[depth]):
+                break
+        else:
+            # No more plaintext matches at this depth, so backtrack.
+            match_iterators.pop()
+            added_letters.pop()
+            depth -= 1
+            continue
+
+        chosen_words[word_pos] = plaintext_match
+
+        if depth == len(search_order) - 1:
+            if log_tuple_matches:
+                logger.info("\n%s %s", _bold_string('Tuple match:'), ' '.join(chosen_words))
+
+            for tuple_word_pos, tuple_word in enumerate(chosen_words):
+                tuple_plaintext_matches[tuple_word_pos].add(tuple_word)
+        else:
+            depth += 1
+            group_key = tuple(cypher_to_plain[enc_letter] for enc_letter in shared_letters[depth])
+            match_iterators.append(iter(match_groups[depth].get(group_key, list())))
+            added_letters.append(list())
+
+    return _filter_plaintext_matches(plaintext_matches, tuple_plaintext_matches), candidates_examined
+
+
+def most_likely_join(encrypted_words: list, plaintext_letters: list, plaintext_weights: list, max_tuples: int = 1, max_candidates: int = None,
+                     budget: DeductionBudget = None) -> tuple:
+    """
+    Searches for matching tuples like backtracking_join, but tries the plaintext matches of each word in descending
+    order of weight, and stops as soon as max_tuples tuples have been found or max_candidates plaintext matches have
+    been examined. Returns the tuples found, each a list of the positions of its plaintext matches, the number of
+    plaintext matches examined, and whether the search was complete: False if it stopped before examining every tuple.
+    """
+    letter_positions = [_first_letter_positions(encrypted_word) for encrypted_word in encrypted_words]
+    search_order = sorted(range(len(encrypted_words)), key=lambda word_pos: len(plaintext_letters[word_pos]))
+
+    # The letters each word shares with the words searched before it, as in backtracking_join.
+    shared_letters = list()
+    searched_letters = set()
+    for word_pos in search_order:
+        shared_letters.append([(enc_letter, letter_pos) for enc_letter, letter_pos in letter_positions[word_pos] if enc_letter in searched_letters])
+        searched_letters.update(encrypted_words[word_pos])
+
+    # The plaintext match positions of each word that agree with the letters it shares, in descending order of weight.
+    # A search often stops long before it has tried every group, so each word's matches are only sorted when the word
+    # is first reached, and each group is only found (and kept) when first needed.
+    plaintext_matches = [None] * len(encrypted_words)
+    weight_orders = [None] * len(encrypted_words)
+    shared_plaintext_letters = [None] * len(encrypted_words)
+    match_groups = [dict() for _ in encrypted_words]
+
+    def get_match_group(depth: int, group_key: tuple) -> list:
+        word_pos = search_order[depth]
+        if weight_orders[word_pos] is None:
+            plaintext_matches[word_pos] = WordIndex.letters_to_words(plaintext_letters[word_pos])
+            weight_orders[word_pos] = np.argsort(-plaintext_weights[word_pos], kind='stable')
+            shared_plaintext_letters[word_pos] = plaintext_letters[word_pos][weight_orders[word_pos]][:, [letter_pos for _, letter_pos in shared_letters[depth]]]
+
+        if group_key not in match_groups[depth]:
+            weight_order = weight_orders[word_pos]
+            if len(group_key) > 0:
+                weight_order = weight_order[np.all(shared_plaintext_letters[word_pos] == [ord(letter) for letter in group_key], axis=1)]
+
+            match_groups[depth][group_key] = weight_order.tolist()
+
+        return match_groups[depth][group_key]
+
+    matching_tuples = list()
+    cypher_to_plain = dict()
+    plain_to_cypher = dict()
+    chosen_positions = [None] * len(encrypted_words)
+    candidates_examined = 0
+
+    match_iterators = [iter(get_match_group(0, ()))]
+    added_letters = [list()]
+    depth = 0
+    while depth >= 0:
+        for enc_letter in added_letters[depth]:
+            del plain_to_cypher[cypher_to_plain.pop(enc_letter)]
+        added_letters[depth].clear()
+
+        word_pos = search_order[depth]
+        for match_pos in match_iterators[depth]:
+            candidates_examined += 1
+            if budget is not None and candidates_examined % BUDGET_CHECK_INTERVAL == 0:
+                budget.check(candidates_examined)
+
+            if _extend_mapping(plaintext_matches[word_pos][match_pos], letter_positions[word_pos], cypher_to_plain, plain_to_cypher, added_letters[depth]):
+                break
+
+            if max_candidates is not None and candidates_examined >= max_candidates:
+                return matching_tuples, candidates_examined, False
+        else:
+            match_iterators.pop()
+            added_letters.pop()
+            depth -= 1
+            continue
+
+        chosen_positions[word_pos] = match_pos
+
+        if depth == len(search_order) - 1:
+            matching_tuples.append(list(chosen_positions))
+            if len(matching_tuples) >= max_tuples:
+                return matching_tuples, candidates_examined, False
+        else:
+            depth += 1
+            group_key = tuple(cypher_to_plain[enc_letter] for enc_letter, _ in shared_letters[depth])
+            match_iterators.append(iter(get_match_group(depth, group_key)))
+            added_letters.append(list())
+
+    return matching_tuples, candidates_examined, True
+
+
+def vectorized_join(encrypted_words: list, plaintext_letters: list, budget: DeductionBudget = None, logger: logging.Logger = logger) -> tuple:
+    """
+    Joins the plaintext matches one word at a time as a batch of partial tuples held in NumPy arrays, where each
+    partial tuple records its cyphertext to plaintext letter mapping. The plaintext matches of the next word are sorted
+    by the letters it shares with the words already joined, so each partial tuple is only paired with the matches that
+    agree with its mapping, and a bitmask test drops the pairs that map a new letter to an already used plaintext
+    letter. Returns the same plaintext matches as product_join, and the number of pairs compared.
+    """
+    # Number the plaintext letters so that a set of them fits in a 64 bit mask.
+    symbols, symbol_ids = np.unique(np.concatenate([letters.ravel() for letters in plaintext_letters]), return_inverse=True)
+    if len(symbols) > 64:
+        return backtracking_join(encrypted_words, plaintext_letters, budget, logger)
+
+    split_points = np.cumsum([letters.size for letters in plaintext_letters])[:-1]
+    plaintext_symbols = [ids.reshape(letters.shape).astype(np.int8) for ids, letters in zip(np.split(symbol_ids.ravel(), split_points), plaintext_letters)]
+    symbol_bits = np.left_shift(np.uint64(1), np.arange(len(symbols), dtype=np.uint64))
+
+    # Each encrypted letter is a column of the partial tuple mappings.
+    letter_columns = {enc_letter: column for column, enc_letter in enumerate(dict.fromkeys(''.join(encrypted_words)))}
+
+    # Join the words with the fewest plaintext matches first, so the batch of partial tuples stays small.
+    search_order = sorted(range(len(encrypted_words)), key=lambda word_pos: len(plaintext_letters[word_pos]))
+
+    # Start from a single empty partial tuple. Its chosen plaintext match positions (one column per joined word), the
+    # plaintext letter mapped to each encrypted letter (-1 if unmapped) and the mask of used plaintext letters.
+    chosen = np.empty((1, 0), dtype=np.int32)
+    mapping = np.full((1, len(letter_columns)), -1, dtype=np.int8)
+    used = np.zeros(1, dtype=np.uint64)
+    pairs_compared = 0
+
+    for word_pos in search_order:
+        symbols = plaintext_symbols[word_pos]
+
+        # Every partial tuple has mapped the same encrypted letters, those of the words already joined.
+        shared_letters = list()
+        new_letters = list()
+        for enc_letter, letter_pos in _first_letter_positions(encrypted_words[word_pos]):
+            column = letter_columns[enc_letter]
+            if mapping[0, column] >= 0:
+                shared_letters.append((column, letter_pos))
+            else:
+                new_letters.append((column, letter_pos))
+
+        new_columns = [column for column, _ in new_letters]
+        new_positions = [letter_pos for _, letter_pos in new_letters]
+        new_bits = np.bitwise_or.reduce(symbol_bits[symbols[:, new_positions]], axis=1) if len(new_letters) > 0 else np.zeros(len(symbols), dtype=np.uint64)
+
+        # Sort the plaintext matches by their key letters and find the range of matches agreeing with each partial tuple.
+        key_letters = shared_letters[:_JOIN_KEY_LETTERS]
+        key_weights = 64 ** np.arange(len(key_letters), dtype=np.int64)
+        match_keys = symbols[:, [letter_pos for _, letter_pos in key_letters]] @ key_weights
+        tuple_keys = mapping[:, [column for column, _ in key_letters]] @ key_weights
+
+        match_order = np.argsort(match_keys, kind='stable')
+        sorted_match_keys = match_keys[match_order]
+        range_starts = np.searchsorted(sorted_match_keys, tuple_keys, side='left')
+        range_counts = np.searchsorted(sorted_match_keys, tuple_keys, side='right') - range_starts
+
+        joined_chosen = list()
+        joined_mapping = list()
+        joined_used = list()
+        for batch_start, batch_stop in _batch_bounds(range_counts, VECTORIZED_JOIN_BATCH_SIZE):
+            if budget is not None:
+                budget.check(pairs_compared)
+
+            batch_counts = range_counts[batch_start:batch_stop]
+
+            # Expand each partial tuple into one pair per plaintext match in its range.
+            tuple_ids = np.repeat(np.arange(batch_start, batch_stop), batch_counts)
+            range_offsets = np.arange(len(tuple_ids)) - np.repeat(np.cumsum(batch_counts) - batch_counts, batch_counts)
+            match_ids = match_order[np.repeat(range_starts[batch_start:batch_stop], batch_counts) + range_offsets]
+            pairs_compared += len(tuple_ids)
+
+            consistent = (used[tuple_ids] & new_bits[match_ids]) == 0
+            for column, letter_pos in shared_letters[_JOIN_KEY_LETTERS:]:
+                consistent &= mapping[tuple_ids, column] == symbols[match_ids, letter_pos]
+
+            tuple_ids = tuple_ids[consistent]
+            match_ids = match_ids[consistent]
+
+            batch_mapping = mapping[tuple_ids]
+            batch_mapping[:, new_columns] = symbols[match_ids][:, new_positions]
+
+            joined_chosen.append(np.column_stack([chosen[tuple_ids], match_ids.astype(np.int32)]))
+            joined_mapping.append(batch_mapping)
+            joined_used.append(used[tuple_ids] | new_bits[match_ids])
+
+        if sum(len(batch) for batch in joined_chosen) == 0:
+            return list(), pairs_compared
+
+        chosen = np.concatenate(joined_chosen)
+        mapping = np.concatenate(joined_mapping)
+        used = np.concatenate(joined_used)
+
+        # Words that share few letters can multiply the partial tuples beyond what is sensible to hold in memory.
+        if len(chosen) > VECTORIZED_JOIN_MAX_TUPLES:
+            logger.info("\n%d partial tuples. Continuing with the backtracking join.", len(chosen))
+            tuple_plaintext_matches, candidates_examined = backtracking_join(encrypted_words, plaintext_letters, budget, logger)
+            return tuple_plaintext_matches, pairs_compared + candidates_examined
+
+    if logger.isEnabledFor(logging.INFO):
+        plaintext_matches = [WordIndex.letters_to_words(letters) for letters in plaintext_letters]
+        for tuple_positions in chosen:
+            tuple_words = [plaintext_matches[word_pos][tuple_positions[depth]] for word_pos, depth in sorted(zip(search_order, range(len(search_order))))]
+            logger.info("\n%s %s", _bold_string('Tuple match:'), ' '.join(tuple_words))
+
+    # The columns of the chosen positions are in search order.
+    tuple_plaintext_matches = [None] * len(encrypted_words)
+    for depth, word_pos in enumerate(search_order):
+        tuple_plaintext_matches[word_pos] = np.unique(chosen[:, depth])
+
+    return tuple_plaintext_matches, pairs_compared
+
+
+def sharded_join(join_plaintext_matches, encrypted_words: list, plaintext_letters: list, executor: concurrent.futures.Executor, shard_count: int,
+                 budget: DeductionBudget = None, logger: logging.Logger = logger) -> tuple:
+    """
+    Splits the cartesian product into shards by the plaintext matches of the word with the most of them, and joins the
+    shards with join_plaintext_matches in the executor's processes. Every tuple contains exactly one plaintext match of
+    the split word, so merging the surviving plaintext matches of the shards gives the same sorted positions as joining
+    without shards. Returns them with the total number of tuples compared.
+
+    Each shard is given what is left of the budget, with an equal share of the tuples left, and the budget is checked
+    here while waiting for the shards, so a cancellation stops the join without waiting for them. Shards that haven't started are cancelled; running shards
+    finish in the background, or stop at their own deadline.
+    """
+    split_pos = max(range(len(plaintext_letters)), key=lambda word_pos: len(plaintext_letters[word_pos]))
+    split_letters = plaintext_letters[split_pos]
+    shard_bounds = np.linspace(0, len(split_letters), min(shard_count, len(split_letters)) + 1).astype(np.int64)
+    shard_starts = shard_bounds[:-1]
+
+    shards = [plaintext_letters[:split_pos] + [split_letters[start:end]] + plaintext_letters[split_pos + 1:] for start, end in zip(shard_starts, shard_bounds[1:])]
+    shard_budget = budget.remaining(len(shards)) if budget is not None else None
+    shard_futures = [executor.submit(join_plaintext_matches, encrypted_words, shard, shard_budget, logger) for shard in shards]
+
+    try:
+        pending = shard_futures
+        while len(pending) > 0:
+            _, pending = concurrent.futures.wait(pending, timeout=BUDGET_POLL_SECONDS if budget is not None else None)
+            if budget is not None:
+                budget.check()
+
+        shard_results = [future.result() for future in shard_futures]
+    except BaseException:
+        for future in shard_futures:
+            future.cancel()
+        raise
+
+    shard_positions = [list() for _ in plaintext_letters]
+    tuples_compared = 0
+    for start, (tuple_plaintext_matches, shard_tuples_compared) in zip(shard_starts, shard_results):
+        tuples_compared += shard_tuples_compared
+
+        for word_pos, positions in enumerate(tuple_plaintext_matches):
+            shard_positions[word_pos].append(positions + start if word_pos == split_pos else positions)
+
+    if len(shard_positions[0]) == 0:
+        return list(), tuples_compared
+
+    return [np.unique(np.concatenate(positions)) for positions in shard_positions], tuples_compared
+
+
+def _batch_bounds(counts: np.ndarray, batch_size: int):
+    """Yields (start, stop) ranges of counts that sum to at most batch_size, or a single count if it is larger."""
+    cumulative_counts = np.cumsum(counts)
+    start = 0
+    while start < len(counts):
+        counted = cumulative_counts[start - 1] if start > 0 else 0
+        stop = max(int(np.searchsorted(cumulative_counts, counted + batch_size, side='right')), start + 1)
+        yield start, stop
+        start = stop
+
+
+def _extend_mapping(plaintext_match: str, letter_positions: list, cypher_to_plain: dict, plain_to_cypher: dict, added_letters: list) -> bool:
+    """
+    Adds the letters of a plaintext match to the mapping. Returns False, leaving the mapping unchanged, if the match
+    conflicts with a letter that is already mapped.
+    """
+    for enc_letter, letter_pos in letter_positions:
+        plaintext_letter = plaintext_match[letter_pos]
+        mapped_letter = cypher_to_plain.get(enc_letter)
+
+        if mapped_letter is None:
+            if plaintext_letter in plain_to_cypher:
+                break
+
+            cypher_to_plain[enc_letter] = plaintext_letter
+            plain_to_cypher[plaintext_letter] = enc_letter
+            added_letters.append(enc_letter)
+        elif mapped_letter != plaintext_letter:
+            break
+    else:
+        return True
+
+    for enc_letter in added_letters:
+        del plain_to_cypher[cypher_to_plain.pop(enc_letter)]
+    added_letters.clear()
+
+    return False
+
+
+def _first_letter_positions(encrypted_word: str) -> list:
+    """Returns (letter, position) pairs for the first occurrence of each letter in the encrypted word."""
+    letter_positions = dict()
+    for letter_pos, enc_letter in enumerate(encrypted_word):
+        letter_positions.setdefault(enc_letter, letter_pos)
+
+    return list(letter_positions.items())
+
+
+def _filter_plaintext_matches(plaintext_matches: list, tuple_plaintext_matches: list) -> list:
+    """
+    Returns the positions of the plaintext matches found in a matching tuple, or an empty list if there weren't any.
+    """
+    if len(tuple_plaintext_matches) == 0 or len(tuple_plaintext_matches[0]) == 0:
+        return list()
+
+    return [np.flatnonzero([word in matched_words for word in matches]) for matches, matched_words in zip(plaintext_matches, tuple_plaintext_matches)]
+
+
+def _bold_string(string: str) -> str:
+    return f"\033[1m{string}\033[0m"
@@ -0,0 +1,6 @@
+from enum import Enum, auto
+
+class JoinEngine(Enum):
+    PRODUCT = auto()
+    BACKTRACKING = auto()
+    VECTORIZED = auto()
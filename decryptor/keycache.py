@@ -0,0 +1,79 @@
+import json
+import os
+
+# Maximum number of keys kept by a KeyCache. The least recently used keys are evicted first.
+KEY_CACHE_SIZE = 64
+
+# Minimum number of encrypted letters that a new key must share with a cached key, all mapped to the same plaintext
+# letters, for the keys to be taken as the same key and merged.
+KEY_CACHE_MERGE_MIN_LETTERS = 5
+
+class KeyCache:
+    """
+    A bounded cache of recovered keys, each a dict of encrypted letters (keys) and the plaintext letters they map to
+    (values), in least to most recently used order. A new key that agrees with a cached key on enough of their shared
+    letters is merged into it, so messages that share a key build it up between them. If a cache file is given, the
+    cache is loaded from it and saved to it as JSON by save(), e.g. when the decryptor using the cache is closed.
+    """
+
+    def __init__(self, cache_file: str = None, max_keys: int = KEY_CACHE_SIZE):
+        self.cache_file = cache_file
+        self.max_keys = max_keys
+        self.__keys = list()
+        self.__changed = False
+
+        if cache_file is not None and os.path.exists(cache_file):
+            with open(cache_file, 'r', encoding='utf-8') as cache:
+                self.__keys = json.load(cache)['keys'][-max_keys:]
+
+    def __len__(self) -> int:
+        return len(self.__keys)
+
+    def get_keys(self) -> list:
+        """Returns the cached keys, most recently used first."""
+        return self.__keys[::-1]
+
+    def touch(self, key: dict) -> None:
+        """Marks a cached key as the most recently used."""
+        self.__keys.remove(key)
+        self.__keys.append(key)
+        self.__changed = True
+
+    def put(self, key: dict) -> None:
+        """Adds a key, or merges it into the most recently used cached key that agrees with it."""
+        for cached_key in self.get_keys():
+            if self.__same_key(cached_key, key):
+                cached_key.update(key)
+                self.touch(cached_key)
+                break
+        else:
+            self.__keys.append(dict(key))
+            del self.__keys[:-self.max_keys]
+            self.__changed = True
+
+    def save(self) -> None:
+        """Writes the cache to its cache file, if it has one and has changed."""
+        if self.cache_file is None or not self.__changed:
+            return
+
+        # Write to a temporary file first, so an interrupted save doesn't leave a broken cache file, and processes
+        # sharing the cache file don't write to the same temporary file.
+        temporary_file = f"{self.cache_file}.{os.getpid()}.tmp"
+        with open(temporary_file, 'w', encoding='utf-8') as cache:
+            json.dump({'keys': self.__keys}, cache)
+        os.replace(temporary_file, self.cache_file)
+
+        self.__changed = False
+
+    @staticmethod
+    def __same_key(cached_key: dict, key: dict) -> bool:
+        """
+        Returns True if the keys share at least KEY_CACHE_MERGE_MIN_LETTERS encrypted letters, map every shared encrypted
+        letter to the same plaintext letter, and don't map different encrypted letters to the same plaintext letter.
+        """
+        shared_letters = cached_key.keys() & key.keys()
+        if len(shared_letters) < KEY_CACHE_MERGE_MIN_LETTERS or any(cached_key[letter] != key[letter] for letter in shared_letters):
+            return False
+
+        cached_plaintext_letters = {cached_key[letter] for letter in cached_key.keys() - shared_letters}
+        return not any(key[letter] in cached_plaintext_letters for letter in key.keys() - shared_letters)
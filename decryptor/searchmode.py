@@ -0,0 +1,5 @@
+from enum import Enum, auto
+
+class SearchMode(Enum):
+    EXHAUSTIVE = auto()
+    MOST_LIKELY_FIRST = auto()
@@ -0,0 +1,189 @@
+import collections
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from decryptor.batch import create_worker_pool, decrypt_task
+from decryptor.budget import DeductionBudget
+from decryptor.decryptor import get_level_logger
+from decryptor.examineorder import ExamineOrder
+from decryptor.joinengine import JoinEngine
+from decryptor.searchmode import SearchMode
+
+# Maximum size of a request body in bytes.
+MAX_REQUEST_SIZE = 16 * 1024 * 1024
+
+# Number of seconds over which the recent throughput is measured.
+THROUGHPUT_WINDOW = 60
+
+class DecryptionServer(ThreadingHTTPServer):
+    """
+    A long-running HTTP service that keeps the word index warm in a pool of worker processes. Requests are handled
+    concurrently by threads, which hand the decryption to the pool:
+
+        POST /decrypt   {"message": "...", "order": "LONGEST_TO_SHORTEST", "join_engine": "VECTORIZED", "deadline": 10}
+                        Returns the same result as batch mode. "order", "join_engine", "search", "confirm_unique",
+                        "deadline" (seconds) and "max_tuples" are optional, and override the server's settings.
+        GET  /health    Returns {"status": "ok", ...} once the worker pool is running.
+        GET  /metrics   Returns request counts, decryption times and throughput.
+    """
+    daemon_threads = True
+
+    def __init__(self, address: tuple, index_file: str, log_level: int, examine_word_order: ExamineOrder, join_engine: JoinEngine, workers: int = None,
+                 budget: DeductionBudget = None, search_mode: SearchMode = SearchMode.EXHAUSTIVE, confirm_unique: bool = False):
+        self.examine_word_order = examine_word_order
+        self.join_engine = join_engine
+        self.budget = budget if budget is not None else DeductionBudget()
+        self.search_mode = search_mode
+        self.confirm_unique = confirm_unique
+        self.pool = create_worker_pool(index_file, log_level, workers)
+        self.workers = workers if workers is not None else os.cpu_count()
+        self.metrics = _ServerMetrics()
+        self.logger = get_level_logger(log_level)
+
+        super().__init__(address, _DecryptionRequestHandler)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.pool.terminate()
+        self.pool.join()
+
+
+class _ServerMetrics:
+    """Thread-safe counters for the /metrics endpoint."""
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__started = time.time()
+        self.__requests = collections.Counter()
+        self.__in_flight = 0
+        self.__decrypted = 0
+        self.__errors = 0
+        self.__decrypt_seconds = 0.0
+        self.__tuples_examined = 0
+        self.__recent_completions = collections.deque()
+
+    def request_started(self, path: str) -> None:
+        with self.__lock:
+            self.__requests[path] += 1
+
+    def decrypt_started(self) -> None:
+        with self.__lock:
+            self.__in_flight += 1
+
+    def decrypt_finished(self, result: dict) -> None:
+        now = time.time()
+        with self.__lock:
+            self.__in_flight -= 1
+
+            if 'error' in result:
+                self.__errors += 1
+                return
+
+            self.__decrypted += 1
+            self.__decrypt_seconds += result['stats']['seconds']
+            self.__tuples_examined += result['stats']['tuples_examined']
+            self.__recent_completions.append(now)
+
+    def as_dict(self) -> dict:
+        now = time.time()
+        with self.__lock:
+            while len(self.__recent_completions) > 0 and self.__recent_completions[0] < now - THROUGHPUT_WINDOW:
+                self.__recent_completions.popleft()
+
+            uptime = now - self.__started
+            return {
+                'uptime_seconds': round(uptime, 3),
+                'requests': dict(self.__requests),
+                'in_flight': self.__in_flight,
+                'messages_decrypted': self.__decrypted,
+                'errors': self.__errors,
+                'decrypt_seconds_total': round(self.__decrypt_seconds, 6),
+                'decrypt_seconds_mean': round(self.__decrypt_seconds / self.__decrypted, 6) if self.__decrypted > 0 else None,
+                'tuples_examined_total': self.__tuples_examined,
+                'messages_per_second': round(self.__decrypted / uptime, 3) if uptime > 0 else None,
+                'messages_per_second_recent': round(len(self.__recent_completions) / min(uptime, THROUGHPUT_WINDOW), 3) if uptime > 0 else None,
+            }
+
+
+class _DecryptionRequestHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self) -> None:
+        self.server.metrics.request_started(self.path)
+
+        if self.path == '/health':
+            self.__send_json(200, {'status': 'ok', 'workers': self.server.workers, 'uptime_seconds': self.server.metrics.as_dict()['uptime_seconds']})
+        elif self.path == '/metrics':
+            self.__send_json(200, self.server.metrics.as_dict())
+        else:
+            self.__send_json(404, {'error': f"Unknown path: {self.path}"})
+
+    def do_POST(self) -> None:
+        self.server.metrics.request_started(self.path)
+
+        if self.path != '/decrypt':
+            self.__send_json(404, {'error': f"Unknown path: {self.path}"})
+            return
+
+        try:
+            content_length = int(self.headers.get('Content-Length', 0))
+            if content_length > MAX_REQUEST_SIZE:
+                self.__send_json(413, {'error': f"Request body is larger than {MAX_REQUEST_SIZE} bytes"})
+                return
+
+            request = json.loads(self.rfile.read(content_length).decode('utf-8'))
+            if not isinstance(request, dict):
+                raise ValueError("The request body must be a JSON object")
+
+            # Check the types here, so that a bad request fails with a 400 rather than in a worker.
+            encrypted_message = request['message']
+            if not isinstance(encrypted_message, str):
+                raise ValueError("message must be a string")
+            if not isinstance(request.get('source', ''), str):
+                raise ValueError("source must be a string")
+
+            examine_word_order = self.__get_enum_value(request, 'order', ExamineOrder, self.server.examine_word_order)
+            join_engine = self.__get_enum_value(request, 'join_engine', JoinEngine, self.server.join_engine)
+            search_mode = self.__get_enum_value(request, 'search', SearchMode, self.server.search_mode)
+            confirm_unique = bool(request['confirm_unique']) if 'confirm_unique' in request else self.server.confirm_unique
+            budget = DeductionBudget(float(request['deadline']) if 'deadline' in request else self.server.budget.deadline,
+                                     int(request['max_tuples']) if 'max_tuples' in request else self.server.budget.max_tuples,
+                                     self.server.budget.max_memory)
+        except (ValueError, KeyError, TypeError) as exception:
+            self.__send_json(400, {'error': f"Invalid request: {exception!r}"})
+            return
+
+        self.server.metrics.decrypt_started()
+        result = dict()
+        try:
+            result = self.server.pool.apply(decrypt_task, ((request.get('source'), encrypted_message, examine_word_order, join_engine, budget, search_mode, confirm_unique),))
+        finally:
+            self.server.metrics.decrypt_finished(result if len(result) > 0 else {'error': None})
+
+        self.__send_json(200 if 'error' not in result else 500, result)
+
+    def log_message(self, format: str, *args) -> None:
+        if self.server.logger.isEnabledFor(logging.DEBUG):
+            self.server.logger.debug("%s - %s", self.address_string(), format % args)
+
+    @staticmethod
+    def __get_enum_value(request: dict, field: str, enum_type, default):
+        """Returns the member of the enum named by the request field, or the default if the field isn't given."""
+        if field not in request:
+            return default
+
+        if not isinstance(request[field], str) or request[field] not in enum_type.__members__:
+            raise ValueError(f"{field} must be one of {', '.join(enum_type.__members__)}")
+
+        return enum_type[request[field]]
+
+    def __send_json(self, status: int, body: dict) -> None:
+        response = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
@@ -1,20 +1,55 @@
-import numpy as np
+import functools
+
+# Maximum number of strings whose patterns are kept by StringPattern.cached().
+PATTERN_CACHE_SIZE = 65536
 
 class StringPattern:
     def __init__(self, string):
-        self.string_pattern = self.__string_to_pattern(string)
+        self.string_code = self.string_to_code(string)
+        self.string_pattern = self.__code_to_pattern(self.string_code)
+
+    @staticmethod
+    def string_to_code(string):
+        """
+        Returns a compact code for the pattern of any string: the n-th unique character is replaced with the code point
+        n. Two strings have equal codes exactly when they have equal patterns.
+        """
+        return string.translate({ord(char): index for index, char in enumerate(dict.fromkeys(string), start=1)})
 
     @staticmethod
-    def __string_to_pattern(string):
-        """Returns a patterns representation of any string"""
-        pattern = str()
-        unique_chars_base_repr = dict()
+    def __code_to_pattern(code):
+        """Returns the patterns representation of a code e.g. '8-12234125'"""
+        return str(len(code)) + '-' + code.translate(_PATTERN_DIGITS)
 
-        for char in string:
-            if char not in unique_chars_base_repr:
-                unique_chars_base_repr[char] = np.base_repr(len(unique_chars_base_repr) + 1, base=26)
-            pattern += unique_chars_base_repr[char]
-        return str(len(string)) + '-' + pattern
+    @staticmethod
+    @functools.lru_cache(maxsize=PATTERN_CACHE_SIZE)
+    def cached(string):
+        """Returns the StringPattern for a string, reusing it if the string was seen recently."""
+        return StringPattern(string)
 
     def get_pattern(self):
         return self.string_pattern
+
+    def get_code(self):
+        return self.string_code
+
+
+class _PatternDigits(dict):
+    """
+    Translation table from pattern code points to their base 26 digits e.g. 1 -> '1', 10 -> 'A', 26 -> '10'. Digits are
+    calculated the first time a code point is looked up.
+    """
+    DIGITS = '0123456789ABCDEFGHIJKLMNOP'
+
+    def __missing__(self, index):
+        digits = str()
+        quotient = index
+        while quotient > 0:
+            quotient, remainder = divmod(quotient, len(self.DIGITS))
+            digits = self.DIGITS[remainder] + digits
+
+        self[index] = digits
+        return digits
+
+
+_PATTERN_DIGITS = _PatternDigits()
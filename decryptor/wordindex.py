@@ -0,0 +1,303 @@
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+class WordIndex:
+    """
+    A memory-mapped index of dictionary words by word pattern. Words are interned into integer word IDs, numbered by
+    length and then by pattern, so the words of each pattern have consecutive IDs and are stored as one contiguous block
+    of fixed-width letters. Only the header is read when the index is opened; pattern lookups binary search the sorted
+    pattern table and words are read from the mapped file as they are used, so processes on the same host share the
+    pages of the index.
+
+    Each word length also has an inverted index of its letter positions: for every position, the word IDs of each
+    pattern sorted by the letter at that position (and then by ID), alongside those letters. The words of a pattern
+    with a given letter at a given position are then one binary searched range of sorted IDs, and the words with
+    several known letters are the intersection of those ranges.
+
+    Words can be given weights, e.g. how often they are used, so that likely words can be tried first. Words without a
+    weight, and all words of an index written without weights, have a weight of 0.
+
+    File layout (little-endian):
+        header          magic, pattern count, length count, letter width and the offset and size of each section
+                        (the weights offset is 0 if there are no weights)
+        metadata        JSON object, e.g. the words files the index was built from
+        lengths         (word length, word count, first word ID, letters offset) for each word length
+        patterns        (word length, word count, first word ID) for each pattern, sorted by pattern
+        pattern offsets offset of each pattern in the pattern keys, plus the end offset
+        pattern keys    the ascii patterns, concatenated in sorted order
+        letters         one (word count, word length) block of code points for each word length, in word ID order
+        positions       for each word length, a (word length, word count) block of word IDs (relative to the length's
+                        first word ID) sorted by pattern, then letter, then ID at each position, followed by a block of
+                        the letters in the same order
+        weights         float32 weight of each word, in word ID order
+    """
+    MAGIC = b'SSCWIDX3'
+
+    __HEADER = struct.Struct('<8sIIIIQQQQQQQQ')
+    __LENGTH_DTYPE = np.dtype([('length', '<u4'), ('count', '<u4'), ('first_id', '<u8'), ('offset', '<u8'), ('positions_offset', '<u8')])
+    __PATTERN_DTYPE = np.dtype([('length', '<u4'), ('count', '<u4'), ('first_id', '<u8')])
+
+    def __init__(self, index_file: str):
+        with open(index_file, 'rb') as index:
+            self.__buffer = mmap.mmap(index.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, pattern_count, length_count, letter_width, _, metadata_offset, metadata_size, lengths_offset,
+            patterns_offset, pattern_offsets_offset, pattern_keys_offset, _, weights_offset) = self.__HEADER.unpack_from(self.__buffer)
+
+        if magic != self.MAGIC:
+            raise ValueError(f"{index_file} is not a word index file")
+
+        self.__metadata = json.loads(self.__buffer[metadata_offset:metadata_offset + metadata_size].decode('utf-8'))
+        self.__letter_dtype = np.dtype('u1') if letter_width == 1 else np.dtype('<u4')
+        self.__patterns = np.frombuffer(self.__buffer, dtype=self.__PATTERN_DTYPE, count=pattern_count, offset=patterns_offset)
+        self.__pattern_offsets = np.frombuffer(self.__buffer, dtype='<u8', count=pattern_count + 1, offset=pattern_offsets_offset)
+        self.__pattern_keys_offset = pattern_keys_offset
+
+        # Key = word length, value = (word count, first word ID, letters offset, positions offset).
+        self.__lengths = {int(length['length']): (int(length['count']), int(length['first_id']), int(length['offset']), int(length['positions_offset']))
+                          for length in np.frombuffer(self.__buffer, dtype=self.__LENGTH_DTYPE, count=length_count, offset=lengths_offset)}
+
+        # Key = word length, value = (word count, word length) array of code points mapped from the index file.
+        self.__length_letters = dict()
+
+        # Key = word length, value = (word IDs, letters) (word length, word count) arrays of the letter position index.
+        self.__length_positions = dict()
+
+        # Weight of each word ID, or None if the index has no weights.
+        word_count = sum(length_word_count for length_word_count, _, _, _ in self.__lengths.values())
+        self.__weights = np.frombuffer(self.__buffer, dtype='<f4', count=word_count, offset=weights_offset) if weights_offset > 0 else None
+
+    @classmethod
+    def write(cls, index_file: str, patterns: dict, metadata: dict, weights: dict = None) -> None:
+        """
+        Writes an index file from a dict of word patterns (keys) and lists of unique, uppercase words (values), and
+        optionally a dict of words (keys) and their weights (values).
+        """
+        # Word IDs are numbered by length and then by pattern. Empty words aren't indexed.
+        id_ordered_patterns = sorted((pattern for pattern in patterns if cls.pattern_length(pattern) > 0), key=lambda pattern: (cls.pattern_length(pattern), pattern))
+        letter_width = 1 if all(word.isascii() for pattern in id_ordered_patterns for word in patterns[pattern]) else 4
+        letter_dtype = np.dtype('u1') if letter_width == 1 else np.dtype('<u4')
+
+        length_records = list()
+        pattern_ids = dict()
+        letter_blocks = list()
+        position_ids = list()
+        position_letters = list()
+        next_id = 0
+        for pattern in id_ordered_patterns:
+            word_length = cls.pattern_length(pattern)
+            if len(length_records) == 0 or length_records[-1][0] != word_length:
+                length_records.append([word_length, 0, next_id, 0, 0])
+                position_ids.append(list())
+                position_letters.append(list())
+
+            pattern_ids[pattern] = next_id
+            next_id += len(patterns[pattern])
+
+            block = np.array(patterns[pattern], dtype=f'<U{word_length}').view('<u4').reshape(len(patterns[pattern]), word_length).astype(letter_dtype)
+            letter_blocks.append(block.tobytes())
+
+            # A stable sort keeps the IDs of the words with the same letter in ID order.
+            position_order = np.argsort(block, axis=0, kind='stable')
+            position_ids[-1].append((position_order + length_records[-1][1]).T.astype('<u4'))
+            position_letters[-1].append(np.take_along_axis(block, position_order, axis=0).T)
+
+            length_records[-1][1] += len(patterns[pattern])
+
+        word_weights = None
+        if weights is not None:
+            word_weights = np.array([weights.get(word, 0.0) for pattern in id_ordered_patterns for word in patterns[pattern]], dtype='<f4')
+
+        sorted_patterns = sorted(id_ordered_patterns)
+        pattern_records = np.array([(cls.pattern_length(pattern), len(patterns[pattern]), pattern_ids[pattern]) for pattern in sorted_patterns], dtype=cls.__PATTERN_DTYPE)
+        pattern_keys = [pattern.encode('ascii') for pattern in sorted_patterns]
+        pattern_offsets = np.concatenate([[0], np.cumsum([len(key) for key in pattern_keys])]).astype('<u8')
+        metadata_bytes = json.dumps(metadata).encode('utf-8')
+
+        # Lay out the sections after the header, aligning each to 8 bytes.
+        section_sizes = [len(metadata_bytes), len(length_records) * cls.__LENGTH_DTYPE.itemsize, pattern_records.nbytes, pattern_offsets.nbytes, sum(map(len, pattern_keys))]
+        section_offsets = list()
+        offset = cls.__HEADER.size
+        for section_size in section_sizes:
+            offset = cls.__align(offset)
+            section_offsets.append(offset)
+            offset += section_size
+
+        letters_offset = cls.__align(offset)
+        length_letters_offset = letters_offset
+        for length_record in length_records:
+            length_record[3] = length_letters_offset
+            length_letters_offset += length_record[0] * length_record[1] * letter_width
+
+        position_blocks = [(np.concatenate(ids, axis=1), np.concatenate(letters, axis=1)) for ids, letters in zip(position_ids, position_letters)]
+        positions_offset = cls.__align(length_letters_offset)
+        for length_record, (ids, letters) in zip(length_records, position_blocks):
+            length_record[4] = positions_offset
+            positions_offset = cls.__align(positions_offset + ids.nbytes + letters.nbytes)
+
+        weights_offset = positions_offset if word_weights is not None else 0
+
+        length_records = np.array([tuple(length_record) for length_record in length_records], dtype=cls.__LENGTH_DTYPE)
+        sections = [metadata_bytes, length_records.tobytes(), pattern_records.tobytes(), pattern_offsets.tobytes(), b''.join(pattern_keys)]
+
+        header = cls.__HEADER.pack(cls.MAGIC, len(sorted_patterns), len(length_records), letter_width, 0, section_offsets[0],
+                                   len(metadata_bytes), section_offsets[1], section_offsets[2], section_offsets[3], section_offsets[4], letters_offset,
+                                   weights_offset)
+
+        # Write to a temporary file first, so other processes never map a partly written index.
+        temporary_index_file = f"{index_file}.{os.getpid()}.tmp"
+        with open(temporary_index_file, 'wb') as index:
+            index.write(header)
+            for section, section_offset in zip(sections, section_offsets):
+                index.write(bytes(section_offset - index.tell()))
+                index.write(section)
+
+            index.write(bytes(letters_offset - index.tell()))
+            for letter_block in letter_blocks:
+                index.write(letter_block)
+
+            for length_record, (ids, letters) in zip(length_records, position_blocks):
+                index.write(bytes(int(length_record['positions_offset']) - index.tell()))
+                index.write(ids.tobytes())
+                index.write(letters.tobytes())
+
+            if word_weights is not None:
+                index.write(bytes(weights_offset - index.tell()))
+                index.write(word_weights.tobytes())
+
+        os.replace(temporary_index_file, index_file)
+
+    def get_metadata(self) -> dict:
+        return self.__metadata
+
+    def get_pattern_words(self):
+        """Yields (pattern, words) for every pattern in the index, in pattern order."""
+        pattern_keys = self.__buffer[self.__pattern_keys_offset:self.__pattern_keys_offset + int(self.__pattern_offsets[-1])].decode('ascii')
+        length_words = dict()
+
+        for pattern_index, record in enumerate(self.__patterns):
+            word_length = int(record['length'])
+            if word_length not in length_words:
+                word_count, first_id, _, _ = self.__lengths[word_length]
+                length_words[word_length] = self.get_words(np.arange(first_id, first_id + word_count), word_length)
+
+            first_word = int(record['first_id']) - self.__lengths[word_length][1]
+            pattern = pattern_keys[int(self.__pattern_offsets[pattern_index]):int(self.__pattern_offsets[pattern_index + 1])]
+            yield pattern, length_words[word_length][first_word:first_word + int(record['count'])]
+
+    def get_word_count(self, pattern: str) -> int:
+        """Returns the number of words matching a pattern."""
+        pattern_index = self.__find_pattern(pattern)
+        return int(self.__patterns[pattern_index]['count']) if pattern_index is not None else 0
+
+    def get_word_ids(self, pattern: str, known_letters: dict = None) -> np.ndarray:
+        """
+        Returns the IDs of the words matching a pattern, in dictionary order. The array is empty if there are none. If
+        known_letters is given, as a dict of letter positions (keys) and code points (values), only the words with those
+        letters at those positions are returned.
+        """
+        pattern_index = self.__find_pattern(pattern)
+        if pattern_index is None:
+            return np.empty(0, dtype=np.int64)
+
+        record = self.__patterns[pattern_index]
+        if not known_letters:
+            return np.arange(int(record['first_id']), int(record['first_id']) + int(record['count']), dtype=np.int64)
+
+        word_length = int(record['length'])
+        _, length_first_id, _, _ = self.__lengths[word_length]
+        position_ids, position_letters = self.__get_position_index(word_length)
+        start = int(record['first_id']) - length_first_id
+        stop = start + int(record['count'])
+
+        # The pattern's words with each known letter, as ranges of IDs sorted by the letter at its position.
+        postings = list()
+        for letter_pos, code_point in known_letters.items():
+            letters = position_letters[letter_pos, start:stop]
+            low = start + int(np.searchsorted(letters, code_point, side='left'))
+            high = start + int(np.searchsorted(letters, code_point, side='right'))
+            postings.append(position_ids[letter_pos, low:high])
+
+        # Intersect the smallest ranges first, so the intersections stay small.
+        postings.sort(key=len)
+        word_ids = postings[0]
+        for posting in postings[1:]:
+            if len(word_ids) == 0:
+                break
+
+            word_ids = np.intersect1d(word_ids, posting, assume_unique=True)
+
+        return word_ids.astype(np.int64) + length_first_id
+
+    def has_weights(self) -> bool:
+        """Returns True if the index was written with word weights."""
+        return self.__weights is not None
+
+    def get_weights(self, word_ids: np.ndarray) -> np.ndarray:
+        """Returns the weights of the given words, which are all 0 if the index has no weights."""
+        if self.__weights is None:
+            return np.zeros(len(word_ids), dtype=np.float32)
+
+        return self.__weights[word_ids]
+
+    def get_letters(self, word_ids: np.ndarray, word_length: int) -> np.ndarray:
+        """Returns a (words, word length) array of the code points of the given words, which must all be word_length long."""
+        if word_length not in self.__length_letters:
+            word_count, _, letters_offset, _ = self.__lengths[word_length]
+            self.__length_letters[word_length] = np.frombuffer(self.__buffer, dtype=self.__letter_dtype, count=word_count * word_length,
+                                                               offset=letters_offset).reshape(word_count, word_length)
+
+        _, first_id, _, _ = self.__lengths[word_length]
+        return self.__length_letters[word_length][word_ids - first_id]
+
+    def get_words(self, word_ids: np.ndarray, word_length: int) -> list:
+        """Returns the given words as strings."""
+        return self.letters_to_words(self.get_letters(word_ids, word_length))
+
+    @staticmethod
+    def letters_to_words(letters: np.ndarray) -> list:
+        """Converts a (words, word length) array of code points back to a list of strings."""
+        return np.ascontiguousarray(letters, dtype='<u4').view(f'<U{letters.shape[1]}').ravel().tolist()
+
+    @staticmethod
+    def pattern_length(pattern: str) -> int:
+        return int(pattern.split('-', 1)[0])
+
+    def __get_position_index(self, word_length: int) -> tuple:
+        """Returns the (word length, word count) arrays of sorted word IDs and letters of the letter position index."""
+        if word_length not in self.__length_positions:
+            word_count, _, _, positions_offset = self.__lengths[word_length]
+            position_ids = np.frombuffer(self.__buffer, dtype='<u4', count=word_count * word_length, offset=positions_offset).reshape(word_length, word_count)
+            position_letters = np.frombuffer(self.__buffer, dtype=self.__letter_dtype, count=word_count * word_length,
+                                             offset=positions_offset + position_ids.nbytes).reshape(word_length, word_count)
+            self.__length_positions[word_length] = (position_ids, position_letters)
+
+        return self.__length_positions[word_length]
+
+    def __find_pattern(self, pattern: str):
+        """Binary searches the sorted pattern keys, returning the index of the pattern or None."""
+        pattern_key = pattern.encode('ascii')
+        low = 0
+        high = len(self.__patterns)
+        while low < high:
+            middle = (low + high) // 2
+            start = self.__pattern_keys_offset + int(self.__pattern_offsets[middle])
+            end = self.__pattern_keys_offset + int(self.__pattern_offsets[middle + 1])
+            middle_key = self.__buffer[start:end]
+
+            if middle_key == pattern_key:
+                return middle
+            if middle_key < pattern_key:
+                low = middle + 1
+            else:
+                high = middle
+
+        return None
+
+    @staticmethod
+    def __align(offset: int) -> int:
+        return (offset + 7) // 8 * 8
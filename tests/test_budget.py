@@ -0,0 +1,98 @@
+import concurrent.futures
+import json
+import logging
+import os
+import unittest
+
+from decryptor.batch import read_encrypted_message
+from decryptor.budget import DeductionBudget
+from decryptor.decryptor import SscDecryptor
+from decryptor.examineorder import ExamineOrder
+from decryptor.indexbuilder import build_word_index
+from decryptor.join import backtracking_join, sharded_join
+from decryptor.stringpattern import StringPattern
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MESSAGE_EXAMPLES_DIR = os.path.join(REPOSITORY_DIR, 'message_examples')
+WORD_INDEX_FILE = os.path.join(REPOSITORY_DIR, 'decryptor', 'wordindex.idx')
+FULL_JOIN_ALPHABETS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'full_join_alphabets.json')
+
+# The message example that compares the most tuples when its words are examined from fewest to most matches.
+LARGE_JOIN_MESSAGE = 'message_example_8.txt'
+
+class TestDeductionBudget(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.word_index = build_word_index([os.path.join(REPOSITORY_DIR, 'words', 'dictionary.txt')], WORD_INDEX_FILE)
+        cls.decryptor = SscDecryptor(logging.WARN, cls.word_index)
+
+        with open(FULL_JOIN_ALPHABETS_FILE, 'r', encoding='utf-8') as alphabets_file:
+            cls.full_join_alphabets = json.load(alphabets_file)[ExamineOrder.FEWEST_TO_MOST_MATCHES.name]
+
+    def deduce(self, message_name: str, budget: DeductionBudget) -> dict:
+        with open(os.path.join(MESSAGE_EXAMPLES_DIR, message_name), 'r', encoding='utf-8') as message_file:
+            return self.decryptor.deduce_ciphertext_alphabet(read_encrypted_message(message_file), ExamineOrder.FEWEST_TO_MOST_MATCHES, budget=budget)
+
+    def assert_superset(self, alphabets_map: dict, full_join_alphabets_map: dict):
+        """Asserts that every encrypted letter is unknown or still has the plaintext letters the full join kept."""
+        for letter, plaintext_letters in full_join_alphabets_map.items():
+            if alphabets_map[letter] != ['?']:
+                self.assertLessEqual(set(plaintext_letters), set(alphabets_map[letter]), letter)
+
+    def test_max_tuples(self):
+        alphabets_map = self.deduce(LARGE_JOIN_MESSAGE, DeductionBudget(max_tuples=1000))
+
+        self.assertTrue(self.decryptor.last_stats.truncated)
+        self.assertEqual(self.decryptor.last_stats.truncated_reason, "max tuples")
+        self.assertGreater(len(self.decryptor.last_stats.unexamined_words), 0)
+        self.assert_superset(alphabets_map, self.full_join_alphabets[LARGE_JOIN_MESSAGE])
+
+    def test_deadline(self):
+        alphabets_map = self.deduce(LARGE_JOIN_MESSAGE, DeductionBudget(deadline=0.0))
+
+        self.assertTrue(self.decryptor.last_stats.truncated)
+        self.assertEqual(self.decryptor.last_stats.truncated_reason, "deadline")
+        self.assert_superset(alphabets_map, self.full_join_alphabets[LARGE_JOIN_MESSAGE])
+
+    def test_truncated_message_examples(self):
+        """Stopping at any point keeps the plaintext letters of the full join, as words are only ever narrowed by it."""
+        for message_name, full_join_alphabets_map in self.full_join_alphabets.items():
+            for max_tuples in (0, 10, 100, 1000):
+                with self.subTest(message=message_name, max_tuples=max_tuples):
+                    self.assert_superset(self.deduce(message_name, DeductionBudget(max_tuples=max_tuples)), full_join_alphabets_map)
+
+    def test_remaining(self):
+        budget = DeductionBudget(deadline=60.0, max_tuples=1000)
+        budget.add_tuples(400)
+
+        remaining = budget.remaining(3)
+
+        self.assertEqual(remaining.max_tuples, 200)
+        self.assertLessEqual(remaining.deadline, 60.0)
+        self.assertEqual(DeductionBudget().remaining(3).max_tuples, None)
+
+    def test_sharded_join(self):
+        """Each shard of a join is given an equal share of the tuples left, and the shards keep the same matches."""
+        encrypted_words = ["xyzzy", "zz"]
+        plaintext_letters = [self.word_index.get_letters(self.word_index.get_word_ids(StringPattern(encrypted_word).get_pattern()), len(encrypted_word))
+                             for encrypted_word in encrypted_words]
+        shard_budgets = list()
+
+        def join_plaintext_matches(encrypted_words, plaintext_letters, budget, logger):
+            shard_budgets.append(budget)
+            return backtracking_join(encrypted_words, plaintext_letters, budget, logger)
+
+        budget = DeductionBudget(max_tuples=10000)
+        budget.add_tuples(1000)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            positions, _ = sharded_join(join_plaintext_matches, encrypted_words, plaintext_letters, executor, 4, budget)
+
+        self.assertEqual([shard_budget.max_tuples for shard_budget in shard_budgets], [2250] * 4)
+        self.assertEqual([word_positions.tolist() for word_positions in positions],
+                         [word_positions.tolist() for word_positions in backtracking_join(encrypted_words, plaintext_letters)[0]])
+
+
+if __name__ == '__main__':
+    unittest.main()
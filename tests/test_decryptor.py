@@ -0,0 +1,61 @@
+import json
+import logging
+import os
+import unittest
+
+from decryptor.batch import read_encrypted_message
+from decryptor.decryptor import SscDecryptor
+from decryptor.examineorder import ExamineOrder
+from decryptor.indexbuilder import build_word_index
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MESSAGE_EXAMPLES_DIR = os.path.join(REPOSITORY_DIR, 'message_examples')
+WORD_INDEX_FILE = os.path.join(REPOSITORY_DIR, 'decryptor', 'wordindex.idx')
+
+# The alphabets deduced from each message example under each examine order by joining every examined word at each
+# iteration, before words were joined by component and resolved words were folded into the constraint store. Each
+# value is a map of the encrypted letters and their possible plaintext letters, as one string.
+FULL_JOIN_ALPHABETS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'full_join_alphabets.json')
+
+# Messages of 8 to 30 common words from words/frequencies.txt, each encrypted with a random key, and the alphabets
+# deduced from them in the same way, under each examine order. Short messages of common words leave many words
+# unresolved in separate components, which can still conflict through the plaintext letters they take.
+FULL_JOIN_MESSAGES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'full_join_messages.json')
+
+class TestDeduceCiphertextAlphabet(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        word_index = build_word_index([os.path.join(REPOSITORY_DIR, 'words', 'dictionary.txt')], WORD_INDEX_FILE)
+        cls.decryptor = SscDecryptor(logging.WARN, word_index)
+
+        with open(FULL_JOIN_ALPHABETS_FILE, 'r', encoding='utf-8') as alphabets_file:
+            cls.full_join_alphabets = json.load(alphabets_file)
+
+        with open(FULL_JOIN_MESSAGES_FILE, 'r', encoding='utf-8') as messages_file:
+            cls.full_join_messages = json.load(messages_file)
+
+    def assert_full_join_alphabets(self, encrypted_message: str, order: str, full_join_alphabets_map: dict):
+        alphabets_map = self.decryptor.deduce_ciphertext_alphabet(encrypted_message, ExamineOrder[order])
+
+        self.assertEqual({letter: ''.join(plaintext_letters) for letter, plaintext_letters in alphabets_map.items()}, full_join_alphabets_map)
+        self.assertFalse(self.decryptor.last_stats.truncated)
+
+    def test_message_examples_match_full_join(self):
+        """Joining only the components of the unresolved words deduces the same alphabets as joining every word."""
+        for order, message_alphabets in self.full_join_alphabets.items():
+            for message_name, full_join_alphabets_map in message_alphabets.items():
+                with self.subTest(order=order, message=message_name):
+                    with open(os.path.join(MESSAGE_EXAMPLES_DIR, message_name), 'r', encoding='utf-8') as message_file:
+                        self.assert_full_join_alphabets(read_encrypted_message(message_file), order, full_join_alphabets_map)
+
+    def test_common_word_messages_match_full_join(self):
+        """The components are checked against each other for plaintext letters that both would take."""
+        for message_pos, full_join_message in enumerate(self.full_join_messages):
+            for order, full_join_alphabets_map in full_join_message['alphabets'].items():
+                with self.subTest(order=order, message=message_pos):
+                    self.assert_full_join_alphabets(full_join_message['message'], order, full_join_alphabets_map)
+
+
+if __name__ == '__main__':
+    unittest.main()
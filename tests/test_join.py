@@ -0,0 +1,84 @@
+import logging
+import os
+import unittest
+
+import numpy as np
+
+from decryptor.batch import read_encrypted_message
+from decryptor.decryptor import SscDecryptor
+from decryptor.examineorder import ExamineOrder
+from decryptor.indexbuilder import build_word_index
+from decryptor.join import backtracking_join, product_join, vectorized_join
+from decryptor.joinengine import JoinEngine
+from decryptor.stringpattern import StringPattern
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MESSAGE_EXAMPLES_DIR = os.path.join(REPOSITORY_DIR, 'message_examples')
+WORD_INDEX_FILE = os.path.join(REPOSITORY_DIR, 'decryptor', 'wordindex.idx')
+
+# Groups of plaintext words, encrypted with the reversed alphabet. Each word is joined with the dictionary words of its
+# pattern that start with the same letter, which keeps the cartesian product small enough for product_join.
+PLAINTEXT_WORD_GROUPS = [
+    ["quick", "fox"],
+    ["over", "dog"],
+    ["plaintext", "decrypted", "pattern"],
+    ["message", "letters", "common", "words"],
+    ["substitution", "alphabet", "join"],
+]
+
+def encrypt(word: str) -> str:
+    return ''.join(chr(ord('z') - (ord(letter) - ord('a'))) for letter in word)
+
+def to_letters(words: list) -> np.ndarray:
+    return np.array([[ord(letter) for letter in word] for word in words], dtype=np.uint8)
+
+class TestJoinEngines(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.word_index = build_word_index([os.path.join(REPOSITORY_DIR, 'words', 'dictionary.txt')], WORD_INDEX_FILE)
+
+    def assert_same_joins(self, encrypted_words: list, plaintext_letters: list) -> list:
+        """Asserts that every join engine keeps the same plaintext matches, and returns their positions."""
+        product_positions, _ = product_join(encrypted_words, plaintext_letters)
+        product_positions = [positions.tolist() for positions in product_positions]
+
+        for join in (backtracking_join, vectorized_join):
+            with self.subTest(join=join.__name__):
+                positions, _ = join(encrypted_words, plaintext_letters)
+                self.assertEqual([word_positions.tolist() for word_positions in positions], product_positions)
+
+        return product_positions
+
+    def test_dictionary_words(self):
+        for words in PLAINTEXT_WORD_GROUPS:
+            with self.subTest(words=words):
+                encrypted_words = [encrypt(word) for word in words]
+                plaintext_letters = list()
+                for word, encrypted_word in zip(words, encrypted_words):
+                    word_ids = self.word_index.get_word_ids(StringPattern(encrypted_word).get_pattern(), {0: ord(word[0].upper())})
+                    plaintext_letters.append(self.word_index.get_letters(word_ids, len(word)))
+
+                # The plaintext words are always part of a consistent tuple.
+                self.assertGreater(len(self.assert_same_joins(encrypted_words, plaintext_letters)), 0)
+
+    def test_all_different(self):
+        # A plaintext letter can only be encrypted by one letter, so "c" and "d" can't both be "E".
+        self.assertEqual(self.assert_same_joins(["abc", "abd"], [to_letters(["THE"]), to_letters(["THE"])]), [])
+        self.assertEqual(self.assert_same_joins(["abc", "abd"], [to_letters(["THE", "SHE"]), to_letters(["THE", "SHY", "THY"])]), [[0, 1], [1, 2]])
+
+    def test_message_examples(self):
+        """Every join engine deduces the same alphabets from the message examples."""
+        decryptor = SscDecryptor(logging.WARN, self.word_index)
+        for message_name in sorted(name for name in os.listdir(MESSAGE_EXAMPLES_DIR) if name.endswith('.txt')):
+            with open(os.path.join(MESSAGE_EXAMPLES_DIR, message_name), 'r', encoding='utf-8') as message_file:
+                encrypted_message = read_encrypted_message(message_file)
+
+            alphabets_maps = [decryptor.deduce_ciphertext_alphabet(encrypted_message, ExamineOrder.LONGEST_TO_SHORTEST, join_engine) for join_engine in JoinEngine]
+            with self.subTest(message=message_name):
+                for join_engine, alphabets_map in zip(JoinEngine, alphabets_maps):
+                    self.assertEqual(alphabets_map, alphabets_maps[0], join_engine.name)
+
+
+if __name__ == '__main__':
+    unittest.main()
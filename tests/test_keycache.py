@@ -0,0 +1,74 @@
+import logging
+import os
+import string
+import tempfile
+import unittest
+
+from decryptor.batch import read_encrypted_message
+from decryptor.budget import DeductionBudget
+from decryptor.decryptor import SscDecryptor
+from decryptor.examineorder import ExamineOrder
+from decryptor.indexbuilder import build_word_index
+from decryptor.keycache import KeyCache
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MESSAGE_EXAMPLES_DIR = os.path.join(REPOSITORY_DIR, 'message_examples')
+WORD_INDEX_FILE = os.path.join(REPOSITORY_DIR, 'decryptor', 'wordindex.idx')
+
+# The key that maps each letter to the letter at the same position from the end of the alphabet.
+REVERSED_KEY = dict(zip(string.ascii_uppercase, reversed(string.ascii_uppercase)))
+
+# Dictionary words, and words with plaintext matches that aren't dictionary words.
+DICTIONARY_WORDS = ["the", "quick", "brown", "fox", "jumps", "over", "lazy", "dog", "again"]
+OTHER_WORDS = ["qxzjv", "vjzxq"]
+
+def encrypt(words: list) -> str:
+    return ' '.join(words).translate(str.maketrans(string.ascii_lowercase, string.ascii_lowercase[::-1]))
+
+class TestKeyCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.word_index = build_word_index([os.path.join(REPOSITORY_DIR, 'words', 'dictionary.txt')], WORD_INDEX_FILE)
+
+        with open(os.path.join(MESSAGE_EXAMPLES_DIR, 'message_example_1.txt'), 'r', encoding='utf-8') as message_file:
+            cls.encrypted_message = read_encrypted_message(message_file)
+
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache_file = os.path.join(cache_dir, 'keys.json')
+            decryptor = SscDecryptor(logging.WARN, self.word_index, key_cache=KeyCache(cache_file))
+            alphabets_map = decryptor.deduce_ciphertext_alphabet(self.encrypted_message, ExamineOrder.LONGEST_TO_SHORTEST)
+
+            # The cache is only saved on close, through a temporary file that is renamed over the cache file.
+            self.assertFalse(decryptor.last_stats.cached_key)
+            self.assertEqual(os.listdir(cache_dir), [])
+            decryptor.close()
+            self.assertEqual(os.listdir(cache_dir), ['keys.json'])
+
+            key_cache = KeyCache(cache_file)
+            self.assertEqual(len(key_cache), 1)
+
+            decryptor = SscDecryptor(logging.WARN, self.word_index, key_cache=key_cache)
+            cached_alphabets_map = decryptor.deduce_ciphertext_alphabet(self.encrypted_message, ExamineOrder.LONGEST_TO_SHORTEST)
+
+            self.assertTrue(decryptor.last_stats.cached_key)
+            self.assertEqual(cached_alphabets_map, alphabets_map)
+
+    def test_min_score(self):
+        """A cached key is used if at least KEY_CACHE_MIN_SCORE of the words decrypt to dictionary words under it."""
+        for other_words, cached in ((0, True), (1, True), (2, False)):
+            with self.subTest(other_words=other_words):
+                key_cache = KeyCache()
+                key_cache.put(REVERSED_KEY)
+                decryptor = SscDecryptor(logging.WARN, self.word_index, key_cache=key_cache)
+
+                # Stop at once if the cached key isn't used.
+                decryptor.deduce_ciphertext_alphabet(encrypt(DICTIONARY_WORDS + OTHER_WORDS[:other_words]), ExamineOrder.LONGEST_TO_SHORTEST,
+                                                     budget=DeductionBudget(max_tuples=0))
+
+                self.assertEqual(decryptor.last_stats.cached_key, cached)
+
+
+if __name__ == '__main__':
+    unittest.main()
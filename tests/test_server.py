@@ -0,0 +1,97 @@
+import json
+import logging
+import os
+import threading
+import unittest
+import urllib.error
+import urllib.request
+
+from decryptor.examineorder import ExamineOrder
+from decryptor.indexbuilder import build_word_index
+from decryptor.joinengine import JoinEngine
+from decryptor.server import DecryptionServer
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORD_INDEX_FILE = os.path.join(REPOSITORY_DIR, 'decryptor', 'wordindex.idx')
+
+class TestDecryptionServer(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        build_word_index([os.path.join(REPOSITORY_DIR, 'words', 'dictionary.txt')], WORD_INDEX_FILE)
+
+        # Port 0 picks a free port.
+        cls.server = DecryptionServer(('127.0.0.1', 0), WORD_INDEX_FILE, logging.WARN, ExamineOrder.LONGEST_TO_SHORTEST, JoinEngine.VECTORIZED, workers=1)
+        cls.server_thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.server_thread.start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.server_thread.join()
+
+    def request(self, path: str, body: bytes = None) -> tuple:
+        """Returns the status and the JSON body of the response to a GET, or a POST if a body is given."""
+        try:
+            with urllib.request.urlopen(urllib.request.Request(self.url + path, data=body), timeout=60) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as error:
+            return error.code, json.loads(error.read())
+
+    def test_decrypt(self):
+        status, result = self.request('/decrypt', json.dumps({'message': "kozrmgvcg xrksvigvcg", 'source': 'test'}).encode())
+
+        self.assertEqual(status, 200)
+        self.assertEqual(result['source'], 'test')
+        self.assertEqual(result['decrypted_message'], "plaintext ciphertext")
+        self.assertFalse(result['stats']['truncated'])
+
+    def test_decrypt_invalid_requests(self):
+        invalid_bodies = [
+            b'not json',
+            b'["kozrmgvcg xrksvigvcg"]',
+            json.dumps({}).encode(),
+            json.dumps({'message': 5}).encode(),
+            json.dumps({'message': "kozrmgvcg", 'source': 5}).encode(),
+            json.dumps({'message': "kozrmgvcg", 'order': 'RANDOM'}).encode(),
+            json.dumps({'message': "kozrmgvcg", 'join_engine': 1}).encode(),
+            json.dumps({'message': "kozrmgvcg", 'search': None}).encode(),
+            json.dumps({'message': "kozrmgvcg", 'deadline': 'soon'}).encode(),
+        ]
+
+        for body in invalid_bodies:
+            with self.subTest(body=body):
+                status, result = self.request('/decrypt', body)
+
+                self.assertEqual(status, 400)
+                self.assertIn('error', result)
+
+    def test_unknown_path(self):
+        self.assertEqual(self.request('/decode', b'{}')[0], 404)
+        self.assertEqual(self.request('/status')[0], 404)
+
+    def test_health(self):
+        status, result = self.request('/health')
+
+        self.assertEqual(status, 200)
+        self.assertEqual(result['status'], 'ok')
+        self.assertEqual(result['workers'], 1)
+
+    def test_metrics(self):
+        decrypted = self.request('/metrics')[1]['messages_decrypted']
+        self.request('/decrypt', json.dumps({'message': "kozrmgvcg xrksvigvcg"}).encode())
+        self.request('/decrypt', json.dumps({'message': 5}).encode())
+
+        status, result = self.request('/metrics')
+
+        self.assertEqual(status, 200)
+        self.assertEqual(result['messages_decrypted'], decrypted + 1)
+        self.assertEqual(result['errors'], 0)
+        self.assertGreaterEqual(result['requests']['/decrypt'], 2)
+        self.assertEqual(result['in_flight'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()